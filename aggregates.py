@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Incrementally maintained summary tables for the `queries.sql` report set.
+
+Q1, Q5, Q6 and Q9 aggregate the whole `results`/`pit_stops` history. The
+tables below keep those aggregates, and statement-level triggers on the two
+source tables append every inserted, updated or deleted row to a change log
+(+1 for the new row, -1 for the old one). A refresh consumes the log with
+DELETE ... RETURNING, so it only sees changes whose transactions have
+committed; rows still in flight, e.g. from parallel `auto_insert.py
+--workers` holding id blocks, are picked up by the next refresh instead of
+being skipped by an id high-water mark.
+
+The first refresh installs the triggers and builds the tables from a full
+scan; `--rebuild` repeats that.
+"""
+
+import argparse
+import time
+from connection import F1DatabaseConnector
+
+SCHEMA_SQL = """
+DROP TABLE IF EXISTS agg_watermarks;
+CREATE TABLE IF NOT EXISTS agg_sources (
+    source TEXT PRIMARY KEY,
+    built_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS agg_results_log (
+    sign SMALLINT NOT NULL,
+    raceid INTEGER,
+    driverid INTEGER,
+    statusid INTEGER,
+    position INTEGER,
+    points NUMERIC
+);
+CREATE TABLE IF NOT EXISTS agg_pit_stops_log (
+    sign SMALLINT NOT NULL,
+    raceid INTEGER,
+    milliseconds BIGINT
+);
+CREATE TABLE IF NOT EXISTS agg_driver_points (
+    driverid INTEGER PRIMARY KEY,
+    total_points NUMERIC NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_driver_podiums (
+    driverid INTEGER PRIMARY KEY,
+    podiums BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_season_dnfs (
+    year INTEGER PRIMARY KEY,
+    dnfs BIGINT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agg_season_pits (
+    year INTEGER PRIMARY KEY,
+    total_ms NUMERIC NOT NULL,
+    stops BIGINT NOT NULL
+);
+"""
+
+# Log function per source: one INSERT ... SELECT per statement, not per row.
+# Transition tables only exist for the matching events, hence the TG_OP checks.
+LOG_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION {log}_append() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO {log} SELECT -1, {columns} FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {log} SELECT 1, {columns} FROM new_rows;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+# A trigger with transition tables can only fire on one event
+LOG_TRIGGERS = {
+    "INSERT": "NEW TABLE AS new_rows",
+    "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "OLD TABLE AS old_rows",
+}
+
+SUMMARY_TABLES = ["agg_driver_points", "agg_driver_podiums", "agg_season_dnfs", "agg_season_pits"]
+
+# Each delta query merges the signed changes in `{delta}` into a summary table
+RESULTS_DELTAS = [
+    """
+    INSERT INTO agg_driver_points (driverid, total_points)
+    SELECT d.driverid, COALESCE(SUM(d.sign * d.points), 0)
+    FROM {delta} d
+    GROUP BY d.driverid
+    ON CONFLICT (driverid) DO UPDATE
+    SET total_points = agg_driver_points.total_points + EXCLUDED.total_points
+    """,
+    """
+    INSERT INTO agg_driver_podiums (driverid, podiums)
+    SELECT d.driverid, SUM(d.sign)
+    FROM {delta} d
+    WHERE d.position IN (1,2,3)
+    GROUP BY d.driverid
+    ON CONFLICT (driverid) DO UPDATE
+    SET podiums = agg_driver_podiums.podiums + EXCLUDED.podiums
+    """,
+    "DELETE FROM agg_driver_podiums WHERE podiums = 0",
+    """
+    INSERT INTO agg_season_dnfs (year, dnfs)
+    SELECT ra.year, SUM(d.sign)
+    FROM {delta} d
+    JOIN races ra ON ra.raceid = d.raceid
+    JOIN status s ON s.statusid = d.statusid
+    WHERE s.status <> 'Finished'
+    GROUP BY ra.year
+    ON CONFLICT (year) DO UPDATE
+    SET dnfs = agg_season_dnfs.dnfs + EXCLUDED.dnfs
+    """,
+    "DELETE FROM agg_season_dnfs WHERE dnfs = 0",
+]
+
+PIT_STOPS_DELTAS = [
+    """
+    INSERT INTO agg_season_pits (year, total_ms, stops)
+    SELECT ra.year, COALESCE(SUM(d.sign * d.milliseconds), 0),
+           COALESCE(SUM(d.sign) FILTER (WHERE d.milliseconds IS NOT NULL), 0)
+    FROM {delta} d
+    JOIN races ra ON ra.raceid = d.raceid
+    GROUP BY ra.year
+    ON CONFLICT (year) DO UPDATE
+    SET total_ms = agg_season_pits.total_ms + EXCLUDED.total_ms,
+        stops = agg_season_pits.stops + EXCLUDED.stops
+    """,
+    "DELETE FROM agg_season_pits WHERE stops = 0",
+]
+
+SOURCES = {
+    # source: (table, change log, logged columns, summary tables, delta statements)
+    "results": ("results", "agg_results_log", "raceid, driverid, statusid, position, points",
+                ["agg_driver_points", "agg_driver_podiums", "agg_season_dnfs"], RESULTS_DELTAS),
+    "pit_stops": ("pit_stops", "agg_pit_stops_log", "raceid, milliseconds",
+                  ["agg_season_pits"], PIT_STOPS_DELTAS),
+}
+
+# Replacement statements keyed by position in queries.sql. `marker` must appear
+# in the original statement, so an edited queries.sql falls back to the full scan.
+SUMMARY_QUERIES = {
+    1: {
+        "marker": "SUM(r.points) AS total_points",
+        "sql": """SELECT d.driverid, d.forename || ' ' || d.surname AS driver, a.total_points
+FROM agg_driver_points a
+JOIN drivers d ON d.driverid = a.driverid
+ORDER BY a.total_points DESC
+LIMIT 10;""",
+    },
+    5: {
+        "marker": "COUNT(*) AS dnfs",
+        "sql": """SELECT year, dnfs
+FROM agg_season_dnfs
+ORDER BY year;""",
+    },
+    6: {
+        "marker": "AS avg_pit_ms",
+        "sql": """SELECT year, ROUND((total_ms / NULLIF(stops, 0))::numeric, 2) AS avg_pit_ms
+FROM agg_season_pits
+ORDER BY year;""",
+    },
+    9: {
+        "marker": "COUNT(*) AS podiums",
+        "sql": """SELECT d.driverid, d.forename || ' ' || d.surname AS driver, a.podiums
+FROM agg_driver_podiums a
+JOIN drivers d ON d.driverid = a.driverid
+ORDER BY a.podiums DESC
+LIMIT 20;""",
+    },
+}
+
+
+def _install_log(cur, table, log, columns):
+    """(Re)create the statement-level triggers that feed `log` from `table`."""
+    cur.execute(LOG_FUNCTION_SQL.format(log=log, columns=columns))
+    for event, transition in LOG_TRIGGERS.items():
+        trigger = f"{log}_{event.lower()}"
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+        cur.execute(f"CREATE TRIGGER {trigger} AFTER {event} ON {table} REFERENCING {transition} "
+                    f"FOR EACH STATEMENT EXECUTE FUNCTION {log}_append()")
+
+
+def refresh_aggregates(conn, rebuild=False):
+    """Bring the summary tables up to date; return {source: changed rows applied}.
+
+    Runs in one transaction under an advisory lock, so concurrent refreshes
+    cannot double-count and readers never see half-applied deltas. A source
+    seen for the first time (or every source with `rebuild`) gets its
+    triggers installed and its summaries rebuilt from a full scan.
+    """
+    applied = {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('agg_refresh'))")
+        cur.execute(SCHEMA_SQL)
+        if rebuild:
+            cur.execute("TRUNCATE agg_sources")
+        for source, (table, log, columns, summaries, deltas) in SOURCES.items():
+            delta = f"{log}_delta"
+            cur.execute(f"CREATE TEMP TABLE {delta} (LIKE {log}) ON COMMIT DROP")
+            cur.execute("SELECT 1 FROM agg_sources WHERE source = %s", (source,))
+            if cur.fetchone():
+                cur.execute(f"WITH consumed AS (DELETE FROM {log} RETURNING *) "
+                            f"INSERT INTO {delta} SELECT * FROM consumed")
+            else:
+                # Installing the triggers locks out writers until commit, and the
+                # TRUNCATE drops log rows the full scan below already includes
+                _install_log(cur, table, log, columns)
+                cur.execute(f"TRUNCATE {log}, " + ", ".join(summaries))
+                cur.execute("INSERT INTO agg_sources (source) VALUES (%s)", (source,))
+                cur.execute(f"INSERT INTO {delta} SELECT 1, {columns} FROM {table}")
+            applied[source] = cur.rowcount
+            for stmt in deltas:
+                cur.execute(stmt.format(delta=delta))
+    conn.commit()
+    return applied
+
+
+def substitute_queries(statements):
+    """Return `statements` with the aggregate-backed queries swapped in."""
+    out = list(statements)
+    for index, summary in SUMMARY_QUERIES.items():
+        if index > len(out):
+            continue
+        if summary["marker"] in out[index - 1]:
+            out[index - 1] = summary["sql"]
+        else:
+            print(f"Q{index} no longer matches its summary table; running the full query")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the incremental summary tables")
+    parser.add_argument("--rebuild", action="store_true", help="reinstall the change-log triggers and rebuild from scratch")
+    args = parser.parse_args()
+
+    connector = F1DatabaseConnector(quiet=True)
+    if not connector.connect():
+        print("Failed to connect. Please check your .env settings.")
+        return
+    try:
+        start = time.perf_counter()
+        applied = refresh_aggregates(connector.connection, rebuild=args.rebuild)
+        for source, rows in applied.items():
+            print(f"{source}: applied {rows} changed rows" if rows else f"{source}: up to date")
+        print(f"Aggregates refreshed in {time.perf_counter() - start:.2f}s")
+    finally:
+        connector.disconnect()
+
+
+if __name__ == "__main__":
+    main()
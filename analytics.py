@@ -1,105 +1,313 @@
 #!/usr/bin/env python3
 """F1 Analytics: Visualizations and Export to Excel."""
 
+import argparse
+import statistics
+import time
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from connection import F1DatabaseConnector
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.formatting.rule import ColorScaleRule
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
 import os
 
 # Directories
 CHARTS_DIR = os.path.join(os.path.dirname(__file__), "charts")
 EXPORTS_DIR = os.path.join(os.path.dirname(__file__), "exports")
 
-def get_top_drivers_by_season(connector):
-    """Get top 10 drivers by points per season, excluding those with 0 points."""
-    query = """
+# Excel's row limit minus the header row
+MAX_SHEET_ROWS = 1048575
+
+TOP_DRIVERS_DTYPES = {'year': 'int32', 'driver': 'string', 'total_points': 'float64'}
+
+
+def _season_filter(year_from, year_to):
+    """Extra WHERE conditions and params for an optional season range."""
+    conditions = []
+    params = {}
+    if year_from is not None:
+        conditions.append("AND ra.year >= %(year_from)s")
+        params['year_from'] = year_from
+    if year_to is not None:
+        conditions.append("AND ra.year <= %(year_to)s")
+        params['year_to'] = year_to
+    return "\n      ".join(conditions), params
+
+
+def get_top_drivers_by_season(connector, top_n=10, year_from=None, year_to=None, chunksize=None):
+    """Get top `top_n` drivers by points per season, excluding those with 0 points.
+
+    Ranking is done in PostgreSQL with ROW_NUMBER(), so only the rows the chart
+    uses are transferred. `chunksize` reads the result in typed chunks.
+    """
+    season_filter, params = _season_filter(year_from, year_to)
+    params['top_n'] = top_n
+    query = f"""
+    SELECT year, driver, total_points
+    FROM (
+        SELECT ra.year, d.forename || ' ' || d.surname AS driver, SUM(r.points) AS total_points,
+               ROW_NUMBER() OVER (PARTITION BY ra.year ORDER BY SUM(r.points) DESC) AS season_rank
+        FROM results r
+        JOIN drivers d ON d.driverid = r.driverid
+        JOIN races ra ON ra.raceid = r.raceid
+        WHERE r.points > 0
+          {season_filter}
+        GROUP BY ra.year, d.driverid, driver
+    ) ranked
+    WHERE season_rank <= %(top_n)s
+    ORDER BY year, total_points DESC;
+    """
+    result = pd.read_sql_query(query, connector.connection, params=params,
+                               dtype=TOP_DRIVERS_DTYPES, chunksize=chunksize)
+    if chunksize:
+        chunks = list(result)
+        result = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(
+            {col: pd.Series(dtype=dt) for col, dt in TOP_DRIVERS_DTYPES.items()})
+    return result
+
+
+def _get_top_drivers_client_side(connector, top_n=10, year_from=None, year_to=None):
+    """Previous approach: fetch every (season, driver) row and trim in pandas.
+
+    Kept for `benchmark_top_drivers`; returns (top rows, rows transferred).
+    """
+    season_filter, params = _season_filter(year_from, year_to)
+    query = f"""
     SELECT ra.year, d.forename || ' ' || d.surname AS driver, SUM(r.points) AS total_points
     FROM results r
     JOIN drivers d ON d.driverid = r.driverid
     JOIN races ra ON ra.raceid = r.raceid
     WHERE r.points > 0
+      {season_filter}
     GROUP BY ra.year, d.driverid, driver
     ORDER BY ra.year, total_points DESC;
     """
-    df = pd.read_sql_query(query, connector.connection)
-    # For each year, keep only top 10
-    df_top = df.groupby('year').head(10).reset_index(drop=True)
-    return df_top
+    df = pd.read_sql_query(query, connector.connection, params=params)
+    # For each year, keep only top N
+    df_top = df.groupby('year').head(top_n).reset_index(drop=True)
+    return df_top, len(df)
 
-def create_plotly_animation(df):
-    """Create interactive Plotly chart with time slider for top drivers by season."""
-    fig = px.bar(df, x='driver', y='total_points', animation_frame='year',
-                 title='Top 10 F1 Drivers by Points per Season',
-                 labels={'total_points': 'Total Points', 'driver': 'Driver'},
-                 color='driver')
-    fig.update_layout(xaxis_tickangle=-45)
-    # Save to HTML for viewing
+
+def benchmark_top_drivers(connector, top_n=10, year_from=None, year_to=None, repeats=5):
+    """Compare client-side trimming with the server-side window-function query."""
+    timings = {'client': [], 'server': []}
+    transferred = {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _, transferred['client'] = _get_top_drivers_client_side(connector, top_n, year_from, year_to)
+        timings['client'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        transferred['server'] = len(get_top_drivers_by_season(connector, top_n, year_from, year_to))
+        timings['server'].append(time.perf_counter() - start)
+
+    print(f"\nTop-{top_n} per season benchmark ({repeats} runs, median latency):")
+    print(f"{'Mode':<8}{'Rows transferred':>18}{'Latency (ms)':>14}")
+    results = {}
+    for mode in ('client', 'server'):
+        median = statistics.median(timings[mode])
+        results[mode] = {'rows': transferred[mode], 'seconds': median}
+        print(f"{mode:<8}{transferred[mode]:>18}{median * 1000:>14.1f}")
+    return results
+
+
+def build_season_animation(df, x='driver', y='total_points', frame='year',
+                           title='Top 10 F1 Drivers by Points per Season'):
+    """Animated bar chart with one trace per frame.
+
+    `px.bar(color=...)` emits one trace per category per frame, repeating names
+    and colors everywhere. Here each frame is a single bar trace: categories are
+    de-duplicated once and bars are colored by their integer category code, and
+    numeric columns are passed as numpy arrays so newer plotly versions encode
+    them as compact typed arrays.
+    """
+    categories = pd.Index(pd.unique(df[x]))
+    palette = px.colors.qualitative.Dark24
+    n_colors = min(len(categories), len(palette)) or 1
+    # Stepwise colorscale: code k maps to palette[k]
+    colorscale = []
+    for k in range(n_colors):
+        color = palette[k]
+        colorscale.append([k / n_colors, color])
+        colorscale.append([(k + 1) / n_colors, color])
+
+    frames = []
+    for key, part in df.groupby(frame, sort=True):
+        codes = categories.get_indexer(part[x]) % n_colors
+        bar = go.Bar(
+            x=part[x].astype(str).tolist(),
+            y=part[y].to_numpy(dtype='float64'),
+            # +0.5 puts each code in the middle of its colorscale step
+            marker=dict(color=(codes + 0.5).astype('float32'), colorscale=colorscale,
+                        cmin=0, cmax=n_colors, showscale=False),
+        )
+        frames.append(go.Frame(data=[bar], name=str(key)))
+
+    fig = go.Figure(data=frames[0].data if frames else [go.Bar()], frames=frames)
+    steps = [
+        dict(method='animate', label=f.name,
+             args=[[f.name], dict(mode='immediate', frame=dict(duration=0, redraw=True))])
+        for f in frames
+    ]
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title='Driver', tickangle=-45),
+        yaxis=dict(title='Total Points', range=[0, float(df[y].max()) * 1.1 if len(df) else 1]),
+        sliders=[dict(active=0, currentvalue=dict(prefix=f'{frame}='), steps=steps)],
+        updatemenus=[dict(type='buttons', showactive=False, buttons=[
+            dict(label='Play', method='animate',
+                 args=[None, dict(frame=dict(duration=500, redraw=True), fromcurrent=True)]),
+            dict(label='Pause', method='animate',
+                 args=[[None], dict(mode='immediate', frame=dict(duration=0, redraw=False))]),
+        ])],
+    )
+    return fig
+
+
+def write_chart(fig, filename, plotlyjs='directory', show=False):
+    """Write `fig` to CHARTS_DIR without inlining plotly.js.
+
+    `plotlyjs='directory'` references a single shared `plotly.min.js` next to
+    the charts (written once), `'cdn'` loads it from the CDN, and `True`
+    inlines the full bundle as before. `show` opens the chart interactively,
+    which blocks headless batch runs.
+    """
     os.makedirs(CHARTS_DIR, exist_ok=True)
-    fig.write_html(os.path.join(CHARTS_DIR, 'top_drivers_by_season.html'))
+    path = os.path.join(CHARTS_DIR, filename)
+    fig.write_html(path, include_plotlyjs=plotlyjs, auto_play=False)
+    if show:
+        fig.show()
+    return path
+
+
+def render_charts(charts, plotlyjs='directory', show=False):
+    """Render many chart definitions in one process.
+
+    `charts` maps an output filename to `(df, options)`, where options are
+    passed to `build_season_animation`. Returns the written paths.
+    """
+    paths = []
+    for filename, (df, options) in charts.items():
+        start = time.perf_counter()
+        path = write_chart(build_season_animation(df, **options), filename, plotlyjs, show)
+        size_kb = os.path.getsize(path) / 1024
+        print(f"Chart saved to {path} ({size_kb:,.0f} KB, {time.perf_counter() - start:.2f}s)")
+        paths.append(path)
+    return paths
+
+
+def create_plotly_animation(df, show=True, plotlyjs='directory', top_n=10):
+    """Create interactive Plotly chart with time slider for top drivers by season."""
+    fig = build_season_animation(df, title=f'Top {top_n} F1 Drivers by Points per Season')
+    write_chart(fig, 'top_drivers_by_season.html', plotlyjs=plotlyjs, show=show)
     print("Interactive chart saved to charts/top_drivers_by_season.html")
-    fig.show()
+
+
+def _excel_value(value):
+    # Missing values (NaN/NaT/NA) become empty cells
+    return None if pd.isna(value) else value
+
 
 def export_to_excel(dataframes_dict, filename):
-    """Export dataframes to Excel with formatting."""
+    """Export dataframes to Excel with formatting.
+
+    Single pass in openpyxl write-only mode: numeric columns are picked from the
+    DataFrame dtypes and freeze panes, filters and color scales are set before
+    rows are streamed out, so the workbook is never re-opened. Frames longer
+    than one Excel sheet continue on `<name>_2`, `<name>_3`, ...
+    """
     os.makedirs(EXPORTS_DIR, exist_ok=True)
     filepath = os.path.join(EXPORTS_DIR, filename)
-    
+
     total_sheets = 0
     total_rows = 0
-    
-    # Write data to Excel
-    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-        for sheet_name, df in dataframes_dict.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    header_font = Font(bold=True)
+    workbook = Workbook(write_only=True)
+
+    for sheet_name, df in dataframes_dict.items():
+        numeric_cols = [
+            i for i, dtype in enumerate(df.dtypes, start=1)
+            if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        ]
+        last_col = get_column_letter(max(len(df.columns), 1))
+        chunks = range(0, max(len(df), 1), MAX_SHEET_ROWS)
+        for part, offset in enumerate(chunks, start=1):
+            chunk = df.iloc[offset:offset + MAX_SHEET_ROWS]
+            title = sheet_name if part == 1 else f"{sheet_name[:27]}_{part}"
+            worksheet = workbook.create_sheet(title=title[:31])
+            last_row = len(chunk) + 1
+
+            # Frozen rows/columns for headers
+            worksheet.freeze_panes = "B2"
+
+            # Filters on all columns
+            worksheet.auto_filter.ref = f"A1:{last_col}{last_row}"
+
+            # Conditional formatting (gradient fill for numeric columns)
+            if last_row > 1:
+                for col_idx in numeric_cols:
+                    col_letter = get_column_letter(col_idx)
+                    rule = ColorScaleRule(
+                        start_type="min", start_color="FFAA0000",  # Red for min
+                        mid_type="percentile", mid_value=50, mid_color="FFFFFF00",  # Yellow for mid
+                        end_type="max", end_color="FF00AA00"  # Green for max
+                    )
+                    worksheet.conditional_formatting.add(f"{col_letter}2:{col_letter}{last_row}", rule)
+
+            header = []
+            for name in df.columns:
+                cell = WriteOnlyCell(worksheet, value=str(name))
+                cell.font = header_font
+                header.append(cell)
+            worksheet.append(header)
+            for row in chunk.itertuples(index=False, name=None):
+                worksheet.append([_excel_value(v) for v in row])
+
             total_sheets += 1
-            total_rows += len(df)
-    
-    # Apply formatting
-    workbook = load_workbook(filepath)
-    
-    for sheet_name in workbook.sheetnames:
-        worksheet = workbook[sheet_name]
-        
-        # Frozen rows/columns for headers
-        worksheet.freeze_panes = "B2"
-        
-        # Filters on all columns
-        worksheet.auto_filter.ref = worksheet.dimensions
-        
-        # Conditional formatting (gradient fill for numeric columns)
-        for col in worksheet.iter_cols(min_row=2):
-            col_letter = col[0].column_letter
-            # Check if column contains numeric data
-            if any(cell.data_type in ('n', 'f') for cell in col if cell.value is not None):
-                # Gradient fill for numeric columns
-                rule = ColorScaleRule(
-                    start_type="min", start_color="FFAA0000",  # Red for min
-                    mid_type="percentile", mid_value=50, mid_color="FFFFFF00",  # Yellow for mid  
-                    end_type="max", end_color="FF00AA00"  # Green for max
-                )
-                range_ref = f"{col_letter}2:{col_letter}{worksheet.max_row}"
-                worksheet.conditional_formatting.add(range_ref, rule)
-    
+        total_rows += len(df)
+
     workbook.save(filepath)
     print(f"Created file {filename}, {total_sheets} sheets, {total_rows} rows")
     return filepath
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="F1 analytics charts and Excel export")
+    parser.add_argument("--top-n", type=int, default=10, help="drivers per season (default: 10)")
+    parser.add_argument("--year-from", type=int, default=None, help="first season to include")
+    parser.add_argument("--year-to", type=int, default=None, help="last season to include")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare server-side top-N ranking with client-side trimming and exit")
+    parser.add_argument("--batch", action="store_true",
+                        help="headless run: write charts without opening them")
+    parser.add_argument("--plotlyjs", choices=("directory", "cdn", "inline"), default="directory",
+                        help="how chart HTML loads plotly.js: shared local file (default), CDN, or inlined")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
     print("F1 Analytics: Visualizations and Export")
     connector = F1DatabaseConnector()
     if not connector.connect():
         print("Failed to connect to database.")
         return
     try:
-        df = get_top_drivers_by_season(connector)
+        if args.benchmark:
+            benchmark_top_drivers(connector, args.top_n, args.year_from, args.year_to)
+            return
+        df = get_top_drivers_by_season(connector, top_n=args.top_n,
+                                       year_from=args.year_from, year_to=args.year_to)
         print(f"Loaded {len(df)} rows of data.")
-        print("Created interactive bar chart: Top 10 F1 Drivers by Points per Season (with time slider)")
+        print(f"Created interactive bar chart: Top {args.top_n} F1 Drivers by Points per Season (with time slider)")
         print("The chart shows the evolution of top drivers' points across seasons, excluding drivers with 0 points.")
         
         # Create Plotly visualization
-        create_plotly_animation(df)
+        create_plotly_animation(df, show=not args.batch, top_n=args.top_n,
+                                plotlyjs=True if args.plotlyjs == "inline" else args.plotlyjs)
         
         # Export to Excel with formatting
         print("\nExporting data to Excel...")
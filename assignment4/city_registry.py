@@ -0,0 +1,149 @@
+"""
+City/metric registry for the weather exporter
+
+Cities come from a CSV (name,country,lat,lon) or YAML file. YAML may be a
+plain list of cities or a mapping with `cities` and `metrics` sections, where
+each metric is {name, help, field} mapping an Open-Meteo "current" field to a
+gauge. With a shard spec "i/n", each exporter instance keeps only the cities
+whose crc32(name|country) % n == i, so n instances split the registry
+between them. The file is re-read whenever its mtime changes; the exporter
+then drops removed cities' series and adds or removes metric gauges.
+"""
+
+import csv
+import logging
+import os
+import threading
+import zlib
+
+try:
+    import yaml
+except ImportError:  # only needed for .yml/.yaml registries
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(spec):
+    """
+    "i/n" -> (i, n)
+    """
+    index, _, count = str(spec).partition('/')
+    index, count = int(index), int(count or 1)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r}; expected i/n with 0 <= i < n")
+    return index, count
+
+
+def shard_of(city_info, count):
+    key = f"{city_info['name']}|{city_info['country']}".encode('utf-8')
+    return zlib.crc32(key) % count
+
+
+def _city(row):
+    """
+    Validated city dict from a registry row, or None
+    """
+    try:
+        name = str(row['name']).strip()
+        country = str(row.get('country') or '').strip()
+        lat, lon = float(row['lat']), float(row['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not name or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return None
+    return {'name': name, 'country': country, 'lat': lat, 'lon': lon}
+
+
+def read_registry(path):
+    """
+    Return (cities, metrics) from a CSV or YAML registry file
+    """
+    metrics = []
+    if path.lower().endswith(('.yml', '.yaml')):
+        if yaml is None:
+            raise RuntimeError("YAML registries need PyYAML: pip install pyyaml")
+        with open(path, 'r', encoding='utf-8') as fh:
+            data = yaml.safe_load(fh) or []
+        if isinstance(data, dict):
+            rows = data.get('cities') or []
+            metrics = data.get('metrics') or []
+        else:
+            rows = data
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as fh:
+            rows = list(csv.DictReader(fh))
+
+    cities = []
+    seen = set()
+    skipped = 0
+    for row in rows:
+        city = _city(row) if isinstance(row, dict) else None
+        if city is None or (city['name'], city['country']) in seen:
+            skipped += 1
+            continue
+        seen.add((city['name'], city['country']))
+        cities.append(city)
+    if skipped:
+        logger.warning(f"{path}: skipped {skipped} invalid or duplicate city rows")
+
+    metrics = [m for m in metrics if isinstance(m, dict) and m.get('name') and m.get('field')]
+    return cities, metrics
+
+
+class CityRegistry:
+    """
+    This instance's shard of the city registry, reloaded when the file changes
+    """
+
+    def __init__(self, path=None, shard=(0, 1), cities=None):
+        self.path = path
+        self.shard = shard
+        self.mtime = None
+        self.cities = []
+        self.metrics = []
+        self.lock = threading.Lock()
+        if path:
+            self.load()
+        else:
+            self.cities = self._own(cities or [])
+
+    def _own(self, cities):
+        index, count = self.shard
+        if count == 1:
+            return list(cities)
+        return [c for c in cities if shard_of(c, count) == index]
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime
+        cities, metrics = read_registry(self.path)
+        with self.lock:
+            self.cities = self._own(cities)
+            self.metrics = metrics
+            self.mtime = mtime
+        logger.info(f"Loaded {len(self.cities)} of {len(cities)} cities from {self.path} "
+                    f"(shard {self.shard[0]}/{self.shard[1]})")
+
+    def reload_if_changed(self):
+        """
+        Re-read the file if its mtime moved; returns (added, removed) city lists
+
+        A file that fails to load keeps the previous registry.
+        """
+        if not self.path:
+            return [], []
+        try:
+            if os.stat(self.path).st_mtime == self.mtime:
+                return [], []
+            before = {(c['name'], c['country']): c for c in self.cities}
+            old_metrics = self.metrics
+            self.load()
+        except Exception as e:
+            logger.error(f"Failed to reload {self.path}, keeping previous registry: {e}")
+            return [], []
+        if self.metrics != old_metrics:
+            logger.info("Metric definitions changed")
+        after = {(c['name'], c['country']): c for c in self.cities}
+        added = [c for key, c in after.items() if key not in before]
+        removed = [c for key, c in before.items() if key not in after]
+        return added, removed
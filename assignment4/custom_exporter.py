@@ -1,9 +1,17 @@
 
-from prometheus_client import start_http_server, Gauge, Info, Counter
+from prometheus_client import start_http_server, Gauge, Info, Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 import requests
+import os
+import threading
 import time
 import logging
 
+from city_registry import CityRegistry, parse_shard
+from weather_cache import WeatherCache
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -14,71 +22,70 @@ logger = logging.getLogger(__name__)
 # Exporter info
 exporter_info = Info('custom_exporter', 'Information about the custom exporter')
 
-# Weather metrics with labels for multiple cities
-weather_temperature = Gauge(
-    'weather_temperature_celsius',
-    'Current temperature',
-    ['city', 'country']
-)
+# Weather metrics with labels for multiple cities:
+# (metric name, help text, Open-Meteo "current" field; None = declared but not collected)
+WEATHER_METRICS = [
+    ('weather_temperature_celsius', 'Current temperature', 'temperature_2m'),
+    ('weather_apparent_temperature_celsius', 'Feels-like temperature', 'apparent_temperature'),
+    ('weather_windspeed_kmh', 'Current wind speed in km/h', 'wind_speed_10m'),
+    ('weather_wind_direction_degrees', 'Wind direction in degrees', 'wind_direction_10m'),
+    ('weather_pressure_hpa', 'Atmospheric pressure at sea level in hPa', 'pressure_msl'),
+    ('weather_humidity_percent', 'Relative humidity in percent', 'relative_humidity_2m'),
+    ('weather_precipitation_mm', 'Precipitation amount in mm', 'precipitation'),
+    ('weather_cloud_cover_percent', 'Cloud cover percentage', 'cloud_cover'),
+    ('weather_visibility_meters', 'Visibility in meters', None),
+    ('weather_uv_index', 'UV index', None),
+    ('weather_is_day', 'Whether it is day (1) or night (0)', 'is_day'),
+]
 
-weather_apparent_temperature = Gauge(
-    'weather_apparent_temperature_celsius',
-    'Feels-like temperature',
-    ['city', 'country']
-)
+# metric name -> (Gauge, API field); served by WeatherCollector in collector mode
+weather_gauges = {}
+# Where new gauges register; None in collector mode, which serves them itself
+gauge_registry = REGISTRY
 
-weather_windspeed = Gauge(
-    'weather_windspeed_kmh',
-    'Current wind speed in km/h',
-    ['city', 'country']
-)
 
-weather_wind_direction = Gauge(
-    'weather_wind_direction_degrees',
-    'Wind direction in degrees',
-    ['city', 'country']
-)
+def add_weather_metric(name, description, field):
+    if name in weather_gauges:
+        return
+    weather_gauges[name] = (Gauge(name, description, ['city', 'country'], registry=gauge_registry), field)
 
-weather_pressure = Gauge(
-    'weather_pressure_hpa',
-    'Atmospheric pressure at sea level in hPa',
-    ['city', 'country']
-)
 
-weather_humidity = Gauge(
-    'weather_humidity_percent',
-    'Relative humidity in percent',
-    ['city', 'country']
-)
+def remove_weather_metric(name):
+    gauge, _ = weather_gauges.pop(name)
+    if gauge_registry is not None:
+        gauge_registry.unregister(gauge)
 
-weather_precipitation = Gauge(
-    'weather_precipitation_mm',
-    'Precipitation amount in mm',
-    ['city', 'country']
-)
 
-weather_cloud_cover = Gauge(
-    'weather_cloud_cover_percent',
-    'Cloud cover percentage',
-    ['city', 'country']
-)
+def current_gauges():
+    return [gauge for gauge, _ in list(weather_gauges.values())]
 
-weather_visibility = Gauge(
-    'weather_visibility_meters',
-    'Visibility in meters',
-    ['city', 'country']
-)
 
-weather_uv_index = Gauge(
-    'weather_uv_index',
-    'UV index',
-    ['city', 'country']
+for _spec in WEATHER_METRICS:
+    add_weather_metric(*_spec)
+
+
+def current_fields():
+    """
+    Comma-separated "current" fields to request, one per mapped gauge
+    """
+    fields = []
+    for _, field in list(weather_gauges.values()):
+        if field and field not in fields:
+            fields.append(field)
+    return ','.join(fields)
+
+
+# Exporter self-metrics
+weather_collection_duration_seconds = Histogram(
+    'weather_collection_duration_seconds',
+    'Duration of one collection cycle over all cities',
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 25, 30, 60)
 )
 
-weather_is_day = Gauge(
-    'weather_is_day',
-    'Whether it is day (1) or night (0)',
-    ['city', 'country']
+weather_scrape_duration_seconds = Histogram(
+    'weather_scrape_duration_seconds',
+    'Time spent serving weather metrics to a scrape (collector mode)',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
 )
 
 # API status metrics
@@ -99,6 +106,24 @@ weather_api_requests_total = Counter(
     ['city', 'status']
 )
 
+weather_cache_requests_total = Counter(
+    'weather_cache_requests_total',
+    'Weather cache lookups by result (hit/miss)',
+    ['result']
+)
+
+weather_cache_age_seconds = Gauge(
+    'weather_cache_age_seconds',
+    'Seconds since the cached payload was fetched from the API',
+    ['city']
+)
+
+weather_api_http_requests_total = Counter(
+    'weather_api_http_requests_total',
+    'Outbound HTTP requests to the weather API',
+    ['kind', 'status']
+)
+
 # Cities to monitor
 CITIES = [
     {'name': 'Astana', 'country': 'Kazakhstan', 'lat': 51.1694, 'lon': 71.4491},
@@ -106,98 +131,269 @@ CITIES = [
     {'name': 'London', 'country': 'UK', 'lat': 51.5074, 'lon': -0.1278},
 ]
 
+# Optional CSV/YAML registry replacing CITIES, and this instance's shard of it ("i/n")
+CITIES_FILE = os.environ.get('EXPORTER_CITIES_FILE')
+SHARD = os.environ.get('EXPORTER_SHARD', '0/1')
+
+city_registry = CityRegistry(CITIES_FILE, parse_shard(SHARD), cities=CITIES)
+# metric name -> definition, for the gauges the registry file added
+registry_metrics = {}
 
-def fetch_weather_data(city_info):
+
+def apply_registry_metrics():
     """
-    Fetch weather data for a specific city from Open-Meteo API
+    Add, replace or remove the registry-defined gauges to match the registry file
+
+    Names already taken by the built-in WEATHER_METRICS are ignored.
     """
-    city = city_info['name']
-    country = city_info['country']
-    
+    wanted = {m['name']: m for m in city_registry.metrics}
+    for name in list(registry_metrics):
+        if wanted.get(name) != registry_metrics[name]:
+            remove_weather_metric(name)
+            del registry_metrics[name]
+            logger.info(f"Removed registry metric {name}")
+    for name, metric in wanted.items():
+        if name in registry_metrics:
+            continue
+        if name in weather_gauges:
+            logger.warning(f"Registry metric {name} clashes with a built-in metric; ignored")
+            continue
+        add_weather_metric(name, metric.get('help') or name, metric['field'])
+        registry_metrics[name] = metric
+        logger.info(f"Added registry metric {name} ({metric['field']})")
+
+
+apply_registry_metrics()
+
+# Point at a local stub server for testing, e.g. http://127.0.0.1:8080/v1/forecast
+API_URL = os.environ.get('OPEN_METEO_URL', "https://api.open-meteo.com/v1/forecast")
+
+# Collection engine settings (overridable from the environment)
+CONCURRENCY = int(os.environ.get('EXPORTER_CONCURRENCY', '16'))
+RATE_LIMIT = float(os.environ.get('EXPORTER_RATE_LIMIT', '10'))     # requests per second
+RATE_BURST = int(os.environ.get('EXPORTER_RATE_BURST', '20'))
+REQUEST_TIMEOUT = float(os.environ.get('EXPORTER_TIMEOUT', '10'))    # per-city, seconds
+CYCLE_DEADLINE = float(os.environ.get('EXPORTER_CYCLE_DEADLINE', '25'))
+BATCH_SIZE = int(os.environ.get('EXPORTER_BATCH_SIZE', '50'))         # locations per request, 1 = no batching
+# Pause after 429/503 when the API sends no Retry-After header, seconds
+RETRY_AFTER = float(os.environ.get('EXPORTER_RETRY_AFTER', '30'))
+MAX_RETRY_AFTER = 300
+# Payloads persist here across restarts; set to an empty string to keep the cache in memory only
+CACHE_FILE = os.environ.get('EXPORTER_CACHE_FILE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weather_cache.json'))
+UPDATE_INTERVAL = 30
+
+# 'loop' updates gauges every UPDATE_INTERVAL; 'collector' serves them through WeatherCollector
+EXPORTER_MODE = os.environ.get('EXPORTER_MODE', 'loop')
+REFRESH_INTERVAL = float(os.environ.get('EXPORTER_REFRESH_INTERVAL', '15'))
+MAX_STALENESS = float(os.environ.get('EXPORTER_MAX_STALENESS', '90'))
+SCRAPE_REFRESH = os.environ.get('EXPORTER_SCRAPE_REFRESH', '0') == '1'
+SCRAPE_DEADLINE = float(os.environ.get('EXPORTER_SCRAPE_DEADLINE', '5'))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `burst` banked
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Take one token, waiting for it; False if it cannot arrive within `timeout`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_for = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait_for > deadline:
+                return False
+            time.sleep(wait_for)
+
+
+_session = None
+_session_lock = threading.Lock()
+_backoff_until = 0.0
+_backoff_lock = threading.Lock()
+rate_limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+weather_cache = WeatherCache(CACHE_FILE or None)
+
+
+def get_session():
+    """
+    Shared keep-alive session with one pooled connection per worker thread
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=CONCURRENCY)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def back_off(response):
+    """
+    Pause all API requests for the response's Retry-After (or RETRY_AFTER) seconds
+    """
+    global _backoff_until
     try:
-        start_time = time.time()
-        
-        url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            'latitude': city_info['lat'],
-            'longitude': city_info['lon'],
-            'current': 'temperature_2m,relative_humidity_2m,apparent_temperature,'
-                      'is_day,precipitation,cloud_cover,pressure_msl,surface_pressure,'
-                      'wind_speed_10m,wind_direction_10m,wind_gusts_10m',
-            'timezone': 'auto',
-            'forecast_days': 1
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
+        seconds = float(response.headers.get('Retry-After', RETRY_AFTER))
+    except ValueError:  # HTTP-date form
+        seconds = RETRY_AFTER
+    seconds = min(max(seconds, 0.0), MAX_RETRY_AFTER)
+    with _backoff_lock:
+        _backoff_until = max(_backoff_until, time.monotonic() + seconds)
+    logger.warning(f"Weather API returned {response.status_code}; pausing requests for {seconds:.0f}s")
+
+
+def backing_off():
+    return time.monotonic() < _backoff_until
+
+
+def service_unavailable(error):
+    """
+    True for failures that would hit every location alike: throttling, server or network errors
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def location_params(cities):
+    """
+    Query parameters for one request covering `cities` (Open-Meteo takes coordinate lists)
+    """
+    return {
+        'latitude': ','.join(str(c['lat']) for c in cities),
+        'longitude': ','.join(str(c['lon']) for c in cities),
+        'current': current_fields(),
+        'timezone': 'auto',
+        'forecast_days': 1
+    }
+
+
+def request_weather(cities, deadline=None):
+    """
+    One rate-limited API call for `cities`; returns (payloads in city order, seconds)
+
+    Returns (None, 0) when the cycle's rate-limit budget runs out first, or
+    while the API has asked us to back off.
+    """
+    if backing_off():
+        return None, 0.0
+    wait_budget = None if deadline is None else max(0.0, deadline - time.monotonic())
+    if not rate_limiter.acquire(timeout=wait_budget):
+        return None, 0.0
+
+    start_time = time.time()
+    kind = 'batch' if len(cities) > 1 else 'single'
+    try:
+        response = get_session().get(API_URL, params=location_params(cities), timeout=REQUEST_TIMEOUT)
         response_time = time.time() - start_time
-        
+        if response.status_code in (429, 503):
+            back_off(response)
         response.raise_for_status()
         data = response.json()
-        
-        current = data['current']
-        
-        # Update temperature metrics
-        weather_temperature.labels(
-            city=city,
-            country=country
-        ).set(current['temperature_2m'])
-        
-        weather_apparent_temperature.labels(
-            city=city,
-            country=country
-        ).set(current['apparent_temperature'])
-        
-        # Update wind metrics
-        weather_windspeed.labels(
-            city=city,
-            country=country
-        ).set(current['wind_speed_10m'])
-        
-        weather_wind_direction.labels(
-            city=city,
-            country=country
-        ).set(current['wind_direction_10m'])
-        
-        # Update atmospheric metrics
-        weather_pressure.labels(
-            city=city,
-            country=country
-        ).set(current['pressure_msl'])
-        
-        weather_humidity.labels(
-            city=city,
-            country=country
-        ).set(current['relative_humidity_2m'])
-        
-        # Update weather condition metrics
-        weather_precipitation.labels(
-            city=city,
-            country=country
-        ).set(current['precipitation'])
-        
-        weather_cloud_cover.labels(
-            city=city,
-            country=country
-        ).set(current['cloud_cover'])
-        
-        # Update day/night indicator
-        weather_is_day.labels(
-            city=city,
-            country=country
-        ).set(current['is_day'])
-        
-        # Update API performance metrics
-        weather_api_response_time.labels(city=city).set(response_time)
-        weather_api_requests_total.labels(city=city, status='success').inc()
-        weather_api_status.set(1)
-        
-        logger.info(f"Successfully fetched data for {city}: {current['temperature_2m']}°C")
+    except Exception:
+        weather_api_http_requests_total.labels(kind=kind, status='error').inc()
+        raise
+    weather_api_http_requests_total.labels(kind=kind, status='success').inc()
+
+    # A single location comes back as an object, several as an array
+    payloads = data if isinstance(data, list) else [data]
+    if len(payloads) != len(cities):
+        raise ValueError(f"expected {len(cities)} locations in response, got {len(payloads)}")
+    return payloads, response_time
+
+
+def update_city_metrics(city_info, data, response_time=None):
+    """
+    Set the gauges of one city from its API payload
+
+    `response_time` is None for payloads served from the cache.
+    """
+    city = city_info['name']
+    country = city_info['country']
+    current = data['current']
+    
+    for gauge, field in list(weather_gauges.values()):
+        value = current.get(field) if field else None
+        if value is not None:
+            gauge.labels(city=city, country=country).set(value)
+    
+    if response_time is None:
+        return
+
+    # Update API performance metrics
+    weather_api_response_time.labels(city=city).set(response_time)
+    weather_api_requests_total.labels(city=city, status='success').inc()
+    weather_cache.put(city_info, data)
+    
+    logger.info(f"Successfully fetched data for {city}: {current.get('temperature_2m')}°C")
+
+
+def drop_city_series(cities):
+    """
+    Remove the labelled series of cities that left the registry
+    """
+    for city_info in cities:
+        for gauge in current_gauges():
+            try:
+                gauge.remove(city_info['name'], city_info['country'])
+            except KeyError:
+                pass
+        for gauge in (weather_api_response_time, weather_cache_age_seconds):
+            try:
+                gauge.remove(city_info['name'])
+            except KeyError:
+                pass
+
+
+def current_cities():
+    """
+    This instance's cities, picking up registry file changes (cities and metrics)
+    """
+    metrics = city_registry.metrics
+    added, removed = city_registry.reload_if_changed()
+    if added or removed:
+        logger.info(f"City registry changed: {len(added)} added, {len(removed)} removed")
+        drop_city_series(removed)
+    if city_registry.metrics is not metrics:
+        apply_registry_metrics()
+    return city_registry.cities
+
+
+def fetch_weather_data(city_info, deadline=None):
+    """
+    Fetch weather data for a specific city from Open-Meteo API
+    """
+    city = city_info['name']
+    
+    try:
+        payloads, response_time = request_weather([city_info], deadline)
+        if payloads is None:
+            logger.warning(f"Skipped {city}: rate limit budget exhausted or API backing off")
+            weather_api_requests_total.labels(city=city, status='skipped').inc()
+            return False
+        update_city_metrics(city_info, payloads[0], response_time)
         return True
         
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to fetch data for {city}: {e}")
         weather_api_requests_total.labels(city=city, status='error').inc()
-        weather_api_status.set(0)
         return False
     except Exception as e:
         logger.error(f"Unexpected error for {city}: {e}")
@@ -205,47 +401,269 @@ def fetch_weather_data(city_info):
         return False
 
 
-def collect_all_metrics():
+def fetch_weather_batch(cities, deadline=None):
     """
-    Collect metrics for all cities
+    Fetch several cities in one request; returns how many were updated
+
+    Unusable locations in the response, or a batch rejected for its content,
+    are retried one request each. Throttling, server and network errors would
+    fail those requests too, so then the whole batch waits for the next cycle.
     """
-    logger.info("Starting metric collection cycle")
-    success_count = 0
-    
-    for city_info in CITIES:
-        if fetch_weather_data(city_info):
-            success_count += 1
-        time.sleep(1)  # Small delay between cities to avoid rate limiting
-    
-    logger.info(f"Collection cycle complete: {success_count}/{len(CITIES)} cities updated")
+    if len(cities) == 1:
+        return int(fetch_weather_data(cities[0], deadline))
+
+    failed = cities
+    updated = 0
+    try:
+        payloads, response_time = request_weather(cities, deadline)
+        if payloads is None:
+            for city_info in cities:
+                weather_api_requests_total.labels(city=city_info['name'], status='skipped').inc()
+            logger.warning(f"Skipped batch of {len(cities)} cities: rate limit budget exhausted or API backing off")
+            return 0
+        failed = []
+        for city_info, data in zip(cities, payloads):
+            try:
+                update_city_metrics(city_info, data, response_time)
+                updated += 1
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Bad batch payload for {city_info['name']}: {e}")
+                failed.append(city_info)
+    except Exception as e:
+        logger.error(f"Batch request for {len(cities)} cities failed: {e}")
+        if service_unavailable(e):
+            for city_info in cities:
+                weather_api_requests_total.labels(city=city_info['name'], status='error').inc()
+            return 0
+
+    if failed:
+        logger.info(f"Falling back to per-city requests for {len(failed)} cities")
+    for city_info in failed:
+        updated += fetch_weather_data(city_info, deadline)
+    return updated
+
+
+def collect_all_metrics(cities=None):
+    """
+    Collect metrics for all cities concurrently
+
+    Cities whose cached payload is still current are served from the cache.
+    The rest are grouped into multi-location requests of BATCH_SIZE. Up to
+    CONCURRENCY requests run at once and the token bucket keeps the request
+    rate under RATE_LIMIT. Batches not finished within CYCLE_DEADLINE are
+    counted as failed for this cycle.
+    """
+    cities = current_cities() if cities is None else cities
+    logger.info(f"Starting metric collection cycle for {len(cities)} cities")
+    start = time.monotonic()
+    deadline = start + CYCLE_DEADLINE
+
+    cached_count = 0
+    stale = []
+    for city_info in cities:
+        entry = weather_cache.get(city_info)
+        if entry is None:
+            weather_cache_requests_total.labels(result='miss').inc()
+            stale.append(city_info)
+            continue
+        weather_cache_requests_total.labels(result='hit').inc()
+        try:
+            update_city_metrics(city_info, entry['data'])
+            cached_count += 1
+        except (KeyError, TypeError, ValueError):
+            stale.append(city_info)
+
+    size = max(1, BATCH_SIZE)
+    batches = [stale[i:i + size] for i in range(0, len(stale), size)]
+    fetched_count = 0
+    pending = ()
+    if batches:
+        executor = ThreadPoolExecutor(max_workers=min(CONCURRENCY, len(batches)))
+        futures = [executor.submit(fetch_weather_batch, batch, deadline) for batch in batches]
+        done, pending = wait(futures, timeout=CYCLE_DEADLINE)
+        for future in pending:
+            future.cancel()
+        # Requests already in flight finish in the background (bounded by REQUEST_TIMEOUT)
+        executor.shutdown(wait=False)
+
+        fetched_count = sum(f.result() for f in done if not f.cancelled() and f.exception() is None)
+        # Per-request failures race each other; the cycle outcome decides the status
+        weather_api_status.set(1 if fetched_count else 0)
+
+    now = time.time()
+    for city_info in cities:
+        age = weather_cache.age(city_info, now)
+        if age is not None:
+            weather_cache_age_seconds.labels(city=city_info['name']).set(age)
+    try:
+        weather_cache.save()
+    except OSError as e:
+        logger.error(f"Failed to save weather cache: {e}")
+
+    if pending:
+        logger.warning(f"{len(pending)} batches did not finish within {CYCLE_DEADLINE:.0f}s")
+    success_count = cached_count + fetched_count
+    weather_collection_duration_seconds.observe(time.monotonic() - start)
+    logger.info(f"Collection cycle complete: {success_count}/{len(cities)} cities updated "
+                f"({cached_count} cached, {len(batches)} batches) in {time.monotonic() - start:.2f}s")
+    return success_count
+
+
+class WeatherCollector:
+    """
+    Custom collector serving the weather gauges from the last completed refresh
+
+    A background loop refreshes every REFRESH_INTERVAL seconds. A scrape that
+    finds the data older than that can trigger a refresh and wait for it up to
+    SCRAPE_DEADLINE seconds (SCRAPE_REFRESH=1). Staleness is judged per city:
+    a city whose cached payload stopped being current more than MAX_STALENESS
+    seconds ago (i.e. refreshes keep failing for it) has its weather series
+    withheld, so Prometheus sees gaps rather than stale data.
+    """
+
+    def __init__(self, gauges, refresh_interval, max_staleness, scrape_refresh=False, scrape_deadline=5.0):
+        # Callable returning the current gauges, which change with the registry file
+        self.gauges = gauges
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.scrape_refresh = scrape_refresh
+        self.scrape_deadline = scrape_deadline
+        self.last_refresh = None
+        self.lock = threading.Lock()
+        self.future = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather-refresh')
+
+    def age(self):
+        return None if self.last_refresh is None else time.monotonic() - self.last_refresh
+
+    def _refresh(self):
+        try:
+            updated = collect_all_metrics()
+        except Exception as e:
+            logger.error(f"Refresh failed: {e}")
+            return
+        # A cycle that updated nothing does not make the snapshot any fresher
+        if updated or not city_registry.cities:
+            self.last_refresh = time.monotonic()
+
+    def trigger(self):
+        """
+        Start a refresh unless one is already running; returns its future
+        """
+        with self.lock:
+            if self.future is None or self.future.done():
+                self.future = self.executor.submit(self._refresh)
+            return self.future
+
+    def run(self):
+        """
+        Background refresh loop (blocks)
+        """
+        while True:
+            self.trigger().result()
+            time.sleep(self.refresh_interval)
+
+    def describe(self):
+        # Without describe(), registering would call collect() and start a refresh
+        yield GaugeMetricFamily('weather_snapshot_age_seconds', 'Seconds since the last successful refresh')
+        for gauge in self.gauges():
+            yield from gauge.describe()
+
+    def collect(self):
+        start = time.perf_counter()
+        age = self.age()
+        if self.scrape_refresh and (age is None or age > self.refresh_interval):
+            wait([self.trigger()], timeout=self.scrape_deadline)
+            age = self.age()
+
+        yield GaugeMetricFamily('weather_snapshot_age_seconds', 'Seconds since the last successful refresh',
+                                value=age if age is not None else float('nan'))
+        fresh = self.fresh_cities()
+        withheld = set()
+        for gauge in self.gauges():
+            for family in gauge.collect():
+                kept = []
+                for sample in family.samples:
+                    city = (sample.labels.get('city'), sample.labels.get('country'))
+                    if city in fresh:
+                        kept.append(sample)
+                    else:
+                        withheld.add(city)
+                family.samples = kept
+                yield family
+        if withheld:
+            logger.warning(f"Withholding weather values of {len(withheld)} cities with stale or missing data")
+        weather_scrape_duration_seconds.observe(time.perf_counter() - start)
+
+    def fresh_cities(self):
+        """
+        (name, country) of the cities whose data is within the staleness bound
+        """
+        now = time.time()
+        fresh = set()
+        for city_info in city_registry.cities:
+            overdue = weather_cache.overdue(city_info, now)
+            if overdue is not None and overdue <= self.max_staleness:
+                fresh.add((city_info['name'], city_info['country']))
+        return fresh
+
+
+def run_polling_loop():
+    """
+    Original mode: refresh module-level gauges every UPDATE_INTERVAL seconds
+    """
+    while True:
+        try:
+            collect_all_metrics()
+        except KeyboardInterrupt:
+            logger.info("Shutting down exporter...")
+            break
+        except Exception as e:
+            logger.error(f"Error in main loop: {e}")
+        
+        # Update every 30 seconds
+        time.sleep(UPDATE_INTERVAL)
+
+
+def run_collector_mode():
+    """
+    Serve weather gauges through WeatherCollector instead of the default registry
+    """
+    global gauge_registry
+    collector = WeatherCollector(current_gauges, REFRESH_INTERVAL, MAX_STALENESS,
+                                 scrape_refresh=SCRAPE_REFRESH, scrape_deadline=SCRAPE_DEADLINE)
+    for gauge in current_gauges():
+        REGISTRY.unregister(gauge)
+    # Gauges added later by a registry reload stay out of the default registry too
+    gauge_registry = None
+    REGISTRY.register(collector)
+    try:
+        collector.run()
+    except KeyboardInterrupt:
+        logger.info("Shutting down exporter...")
 
 
 if __name__ == '__main__':
+    names = [c['name'] for c in city_registry.cities]
     # Set exporter info
     exporter_info.info({
         'version': '1.0',
         'author': 'Student',
         'data_source': 'Open-Meteo API',
-        'cities': ', '.join([c['name'] for c in CITIES]),
-        'update_interval': '30s'
+        'cities': ', '.join(names) if len(names) <= 10 else f'{len(names)} cities',
+        'shard': SHARD,
+        'update_interval': f'{REFRESH_INTERVAL if EXPORTER_MODE == "collector" else UPDATE_INTERVAL}s',
+        'mode': EXPORTER_MODE
     })
     
-    logger.info("Starting Custom Weather Exporter on port 8000")
-    logger.info(f"Monitoring cities: {[c['name'] for c in CITIES]}")
+    logger.info(f"Starting Custom Weather Exporter on port 8000 ({EXPORTER_MODE} mode)")
+    logger.info(f"Monitoring {len(names)} cities: {names[:10]}{' ...' if len(names) > 10 else ''}")
     
     # Start HTTP server on port 8000
     start_http_server(8000)
     logger.info("HTTP server started successfully")
     
-    # Infinite metrics collection loop
-    while True:
-        try:
-            collect_all_metrics()
-        except KeyboardInterrupt:
-            logger.info("Shutting down exporter...")
-            break
-        except Exception as e:
-            logger.error(f"Error in main loop: {e}")
-        
-        # Update every 30 seconds
-        time.sleep(30)
+    if EXPORTER_MODE == 'collector':
+        run_collector_mode()
+    else:
+        run_polling_loop()
@@ -0,0 +1,117 @@
+"""
+Per-location cache of Open-Meteo "current" payloads for the weather exporter
+
+Open-Meteo recomputes "current" values every `current.interval` seconds
+(15 minutes). An entry stays fresh until the next upstream update is due, so
+collection cycles in between are served without calling the API. The cache
+is saved as JSON so a restarted exporter starts warm.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+
+DEFAULT_TTL = 900   # seconds, when the payload carries no interval
+MIN_TTL = 60        # never refetch sooner than this after a fetch
+
+
+def location_key(city_info):
+    """
+    Cache key for a location (coordinates rounded to ~10 m)
+    """
+    return f"{float(city_info['lat']):.4f},{float(city_info['lon']):.4f}"
+
+
+def valid_until(data, fetched_at):
+    """
+    Epoch seconds at which the upstream "current" block can next change
+    """
+    current = data.get('current') or {}
+    interval = current.get('interval') or DEFAULT_TTL
+    try:
+        # `time` is local to the location; utc_offset_seconds converts it back
+        local = datetime.datetime.fromisoformat(current['time'])
+        observed = local.replace(tzinfo=datetime.timezone.utc).timestamp() - data.get('utc_offset_seconds', 0)
+        expires = observed + interval
+    except (KeyError, TypeError, ValueError):
+        expires = fetched_at + interval
+    return max(expires, fetched_at + MIN_TTL)
+
+
+class WeatherCache:
+    """
+    Thread-safe location -> payload cache with optional JSON persistence
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as fh:
+                    self.entries = json.load(fh)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, city_info, now=None):
+        """
+        Cached entry ({'data', 'fetched_at', 'expires_at'}) if still fresh, else None
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.entries.get(location_key(city_info))
+            if entry is None or entry['expires_at'] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(self, city_info, data, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.entries[location_key(city_info)] = {
+                'data': data,
+                'fetched_at': now,
+                'expires_at': valid_until(data, now),
+            }
+            self.dirty = True
+
+    def age(self, city_info, now=None):
+        """
+        Seconds since the location was last fetched, or None if never
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.entries.get(location_key(city_info))
+        return None if entry is None else now - entry['fetched_at']
+
+    def overdue(self, city_info, now=None):
+        """
+        Seconds since the location's cached payload stopped being current
+        (0 while it is), or None if never fetched
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.entries.get(location_key(city_info))
+        return None if entry is None else max(0.0, now - entry['expires_at'])
+
+    def save(self):
+        """
+        Write the cache to disk if anything changed since the last save
+        """
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(self.entries, fh)
+            os.replace(tmp, self.path)
+            self.dirty = False
@@ -1,6 +1,37 @@
 import open3d as o3d
 import numpy as np
+import argparse
 import copy
+import hashlib
+import json
+import os
+
+import clipping
+import lod
+from geometry_cache import GeometryCache
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(MODEL_DIR, "bunny_model.ply")
+CACHE_DIR = os.path.join(MODEL_DIR, ".stage_cache")
+
+# Pipeline parameters; each cached stage is keyed by the ones it uses
+DEFAULT_PARAMS = {
+    "fallback_depth": 8,        # Poisson depth when the input has no triangles
+    "sample_points": 10000,
+    "normal_radius": 0.1,
+    "normal_max_nn": 30,
+    "orient_k": 15,
+    "poisson_depth": 9,
+    "density_quantile": 0.05,   # drop reconstructed vertices below this density quantile
+    "voxel_size": 0.02,
+    "clip_axis": 0,             # 0=X, 1=Y, 2=Z
+    "clip_offset": 0.0,         # plane position from the center, as a fraction of the extent
+    "gradient_axis": 2,
+    "lod_budget": 0,            # >0: voxel-downsample to this many points and scale radius/depth to the model
+    "lod_levels": 1,            # pyramid levels, each PYRAMID_RATIO times coarser
+    "lod_quality": "final",     # "final" reconstructs from the finest level, "preview" from the coarsest
+    "max_poisson_depth": lod.MAX_DEPTH,
+}
 
 def print_separator(step_number, step_name):
     """Print a nice separator for each step"""
@@ -32,266 +63,325 @@ def print_voxel_info(voxel_grid, step_name=""):
     print(f"Has colors: {len(voxels) > 0}")
     print(f"Voxel size: {voxel_grid.voxel_size}")
 
-# STEP 1: Loading and Visualization
-
-print_separator(1, "Loading and Visualization")
-
-# Load the 3D mesh file
-mesh = o3d.io.read_triangle_mesh("bunny_model.ply")
-
-# Check if mesh has triangles, if not try loading as point cloud directly
-if len(mesh.triangles) == 0:
-    print("\nNote: Model has no triangles. Loading as point cloud instead...")
-    pcd_direct = o3d.io.read_point_cloud("bunny_model.ply")
-    
-    if len(pcd_direct.points) > 0:
+def show(geometries, window_name, headless, next_step=None):
+    """Open a viewer window unless running headless"""
+    if headless:
+        return
+    if next_step:
+        print(f"(Close the window to continue to Step {next_step})")
+    else:
+        print("(Close the window to finish)")
+    o3d.visualization.draw_geometries(geometries, window_name=window_name, width=800, height=600)
+
+
+# Stage cache
+
+class StageCache:
+    """On-disk cache of stage outputs (binary PLY) keyed by input hash and parameters
+
+    Keys chain: a stage's key covers its own parameters and its parent's key,
+    so changing e.g. the voxel size reuses every stage before voxelization.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = []
+        self.misses = []
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(stage, params, parent):
+        payload = json.dumps({"stage": stage, "params": params, "parent": parent}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+    def _path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key}.ply")
+
+    def get(self, stage, params, parent, kind, compute):
+        """Return (geometry, key); `kind` is "mesh" or "pcd", `compute()` builds it on a miss"""
+        key = self.key(stage, params, parent)
+        path = self._path(stage, key)
+        if self.enabled and os.path.exists(path):
+            if kind == "mesh":
+                geometry = o3d.io.read_triangle_mesh(path)
+            else:
+                geometry = o3d.io.read_point_cloud(path)
+            self.hits.append(stage)
+            return geometry, key
+        geometry = compute()
+        self.misses.append(stage)
+        if self.enabled:
+            # Per-process temp name: batch workers may build the same stage concurrently
+            tmp = f"{path[:-4]}.{os.getpid()}.tmp.ply"
+            if kind == "mesh":
+                o3d.io.write_triangle_mesh(tmp, geometry, write_ascii=False)
+            else:
+                o3d.io.write_point_cloud(tmp, geometry, write_ascii=False)
+            os.replace(tmp, path)
+        return geometry, key
+
+
+# Pipeline stages
+
+def load_model(path, fallback_depth=8):
+    """Load a mesh; point-cloud-only files are meshed with Poisson"""
+    mesh = o3d.io.read_triangle_mesh(path)
+
+    # Check if mesh has triangles, if not try loading as point cloud directly
+    if len(mesh.triangles) == 0:
+        print("\nNote: Model has no triangles. Loading as point cloud instead...")
+        pcd_direct = o3d.io.read_point_cloud(path)
+
+        if len(pcd_direct.points) == 0:
+            raise RuntimeError(f"Could not load model {path}. Please check the file.")
         # Create a mesh from the point cloud for step 1
         print("Creating mesh from point cloud for visualization...")
         pcd_direct.estimate_normals()
-        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd_direct, depth=8)
-        mesh.compute_vertex_normals()
-    else:
-        raise RuntimeError("Could not load model. Please check the file.")
-else:
+        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd_direct, depth=fallback_depth)
+
     # Compute normals if not present
     if not mesh.has_vertex_normals():
         mesh.compute_vertex_normals()
-
-print("\nLoaded 3D model successfully!")
-print_mesh_info(mesh, "Original Model")
-
-print("\nDisplaying original mesh...")
-print("(Close the window to continue to Step 2)")
-o3d.visualization.draw_geometries([mesh], 
-                                  window_name="Step 1: Original Mesh",
-                                  width=800, height=600)
-
-# STEP 2: Conversion to Point Cloud
-
-print_separator(2, "Conversion to Point Cloud")
-
-# Sample points from the mesh to create a point cloud
-pcd = mesh.sample_points_uniformly(number_of_points=10000)
-
-print("\nConverted mesh to point cloud!")
-print_point_cloud_info(pcd, "Point Cloud")
-
-print("\nDisplaying point cloud...")
-print("(Close the window to continue to Step 3)")
-o3d.visualization.draw_geometries([pcd], 
-                                  window_name="Step 2: Point Cloud",
-                                  width=800, height=600)
-
-# STEP 3: Surface Reconstruction from Point Cloud
-print_separator(3, "Surface Reconstruction from Point Cloud")
-
-# Estimate normals for the point cloud
-pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(
-    radius=0.1, max_nn=30))
-
-# Orient normals consistently
-pcd.orient_normals_consistent_tangent_plane(k=15)
-
-print("\nPerforming Poisson surface reconstruction...")
-# Perform Poisson surface reconstruction
-mesh_recon, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
-    pcd, depth=9)
-
-print("Surface reconstruction completed!")
-
-# Remove low-density vertices (artifacts)
-vertices_to_remove = densities < np.quantile(densities, 0.05)
-mesh_recon.remove_vertices_by_mask(vertices_to_remove)
-
-# Crop the mesh using bounding box to remove artifacts
-bbox = pcd.get_axis_aligned_bounding_box()
-mesh_cropped = mesh_recon.crop(bbox)
-
-# Compute normals for the reconstructed mesh
-mesh_cropped.compute_vertex_normals()
-
-print("\nArtifacts removed using crop method!")
-print_mesh_info(mesh_cropped, "Reconstructed Mesh")
-
-print("\nDisplaying reconstructed mesh...")
-print("(Close the window to continue to Step 4)")
-o3d.visualization.draw_geometries([mesh_cropped], 
-                                  window_name="Step 3: Reconstructed Mesh",
-                                  width=800, height=600)
-
-# STEP 4: Voxelization
-print_separator(4, "Voxelization")
-
-# Create voxel grid from point cloud
-voxel_size = 0.02  # Adjust this value for different voxel sizes
-voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=voxel_size)
-
-print("\nCreated voxel grid from point cloud!")
-print_voxel_info(voxel_grid, "Voxel Grid")
-
-print("\nDisplaying voxel grid...")
-print("(Close the window to continue to Step 5)")
-o3d.visualization.draw_geometries([voxel_grid], 
-                                  window_name="Step 4: Voxel Grid",
-                                  width=800, height=600)
-
-# STEP 5: Adding a Plane
-
-print_separator(5, "Adding a Plane")
-
-# Get the center and extent of the point cloud
-center = pcd.get_center()
-extent = pcd.get_max_bound() - pcd.get_min_bound()
-
-# Create a vertical plane that will cut through the bunny (same as Step 6 clipping plane)
-plane_height = extent[1] * 1.5  # Height of plane
-plane_depth = extent[2] * 1.5   # Depth of plane
-
-# Create plane as a thin vertical box
-plane = o3d.geometry.TriangleMesh.create_box(
-    width=0.002,  # Very thin (vertical plane)
-    height=plane_height, 
-    depth=plane_depth)
-
-# Position the plane at the center (where the cut will happen in Step 6)
-plane_center = center.copy()
-plane_center[0] = center[0]  # At the center X position (cutting plane)
-
-# Translate plane to position
-plane.translate(plane_center - plane.get_center())
-
-# Color the plane red/orange to show it's a cutting plane
-plane.paint_uniform_color([1.0, 0.3, 0.0])  # Orange-red cutting plane
-plane.compute_vertex_normals()
-
-# Create a copy of point cloud for visualization
-pcd_with_plane = copy.deepcopy(pcd)
-
-print("\nCreated a vertical cutting plane through the object!")
-print(f"Plane dimensions: 0.002 x {plane_height:.3f} x {plane_depth:.3f}")
-print(f"Plane position (center): {plane_center}")
-print("This plane shows where the bunny will be cut in half in Step 6")
-
-print("\nDisplaying object with cutting plane...")
-print("(Close the window to continue to Step 6)")
-o3d.visualization.draw_geometries([pcd_with_plane, plane], 
-                                  window_name="Step 5: Object with Cutting Plane",
-                                  width=800, height=600)
-
-# STEP 6: Surface Clipping
-print_separator(6, "Surface Clipping")
-
-# Define a vertical clipping plane (remove points on the right side)
-# Plane equation: ax + by + cz + d = 0
-# We'll use a vertical plane through the center, removing the right half
-
-# Get points as numpy array
-points = np.asarray(pcd.points)
-
-# Define plane normal (pointing left) and plane point (center)
-plane_normal = np.array([1, 0, 0])  # Normal pointing right (we keep left side)
-plane_point = center  # Plane passes through center
-
-# Calculate which points are on the left side of the plane
-# Point is on left if dot product of (point - plane_point) and normal is negative
-distances = np.dot(points - plane_point, plane_normal)
-mask = distances < 0  # Keep points with negative distance (left side)
-
-# Create clipped point cloud
-pcd_clipped = o3d.geometry.PointCloud()
-pcd_clipped.points = o3d.utility.Vector3dVector(points[mask])
-
-# Copy colors if they exist
-if pcd.has_colors():
-    colors = np.asarray(pcd.colors)
-    pcd_clipped.colors = o3d.utility.Vector3dVector(colors[mask])
-
-# Copy normals if they exist
-if pcd.has_normals():
-    normals = np.asarray(pcd.normals)
-    pcd_clipped.normals = o3d.utility.Vector3dVector(normals[mask])
-
-print("\nClipped point cloud (removed right half)!")
-print_point_cloud_info(pcd_clipped, "Clipped Point Cloud")
-print(f"Points removed: {len(pcd.points) - len(pcd_clipped.points)}")
-print(f"Points remaining: {len(pcd_clipped.points)}")
-
-# Note: For triangle mesh clipping, we would need to reconstruct
-print("\nNote: Clipping performed on point cloud.")
-print("For mesh clipping, reconstruction would be needed.")
-
-print("\nDisplaying clipped point cloud...")
-print("(Close the window to continue to Step 7)")
-o3d.visualization.draw_geometries([pcd_clipped], 
-                                  window_name="Step 6: Clipped Point Cloud",
-                                  width=800, height=600)
-
-# STEP 7: Working with Color and Extremes
-print_separator(7, "Working with Color and Extremes")
-
-# Work with the clipped point cloud
-points = np.asarray(pcd_clipped.points)
-
-# Choose axis for gradient (Z-axis - vertical)
-axis = 2  # 0=X, 1=Y, 2=Z
-axis_name = ['X', 'Y', 'Z'][axis]
-
-# Get min and max along chosen axis
-min_value = points[:, axis].min()
-max_value = points[:, axis].max()
-
-# Find extreme points
-min_idx = np.argmin(points[:, axis])
-max_idx = np.argmax(points[:, axis])
-min_point = points[min_idx]
-max_point = points[max_idx]
-
-print(f"\nApplying color gradient along {axis_name}-axis...")
-print(f"Minimum {axis_name} coordinate: {min_value:.4f} at point {min_point}")
-print(f"Maximum {axis_name} coordinate: {max_value:.4f} at point {max_point}")
-
-# Create color gradient (from blue to red)
-normalized = (points[:, axis] - min_value) / (max_value - min_value)
-colors = np.zeros((len(points), 3))
-colors[:, 0] = normalized       # Red channel increases with height
-colors[:, 2] = 1 - normalized   # Blue channel decreases with height
-
-# Apply colors to point cloud
-pcd_colored = copy.deepcopy(pcd_clipped)
-pcd_colored.colors = o3d.utility.Vector3dVector(colors)
-
-# Create spheres to highlight extreme points
-sphere_min = o3d.geometry.TriangleMesh.create_sphere(radius=0.01)
-sphere_min.translate(min_point)
-sphere_min.paint_uniform_color([0, 1, 0])  # Green for minimum
-sphere_min.compute_vertex_normals()
-
-sphere_max = o3d.geometry.TriangleMesh.create_sphere(radius=0.01)
-sphere_max.translate(max_point)
-sphere_max.paint_uniform_color([1, 1, 0])  # Yellow for maximum
-sphere_max.compute_vertex_normals()
-
-print(f"\nGradient applied! Colors range from blue (min) to red (max)")
-print(f"Extreme points highlighted:")
-print(f"  - Minimum (green sphere): {min_point}")
-print(f"  - Maximum (yellow sphere): {max_point}")
-
-print("\nDisplaying colored point cloud with extreme points...")
-print("(Close the window to finish)")
-o3d.visualization.draw_geometries([pcd_colored, sphere_min, sphere_max], 
-                                  window_name="Step 7: Color Gradient & Extremes",
-                                  width=800, height=600)
-
-print("\n" + "="*80)
-print("ALL 7 STEPS COMPLETED SUCCESSFULLY!")
-print("="*80)
-print("\nSummary:")
-print("✓ Step 1: Loaded and visualized 3D mesh")
-print("✓ Step 2: Converted to point cloud")
-print("✓ Step 3: Reconstructed surface using Poisson")
-print("✓ Step 4: Created voxel grid")
-print("✓ Step 5: Added a plane to the scene")
-print("✓ Step 6: Clipped surface (removed right half)")
-print("✓ Step 7: Applied color gradient and highlighted extremes")
-print("\nAssignment #5 Complete! Ready for defense.")
-print("="*80 + "\n")
+    return mesh
+
+
+def sample_point_cloud(mesh, number_of_points):
+    """Sample points uniformly from the mesh surface"""
+    return mesh.sample_points_uniformly(number_of_points=number_of_points)
+
+
+def estimate_normals(pcd, radius, max_nn, orient_k):
+    """Estimate and consistently orient point normals (in place)"""
+    pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(
+        radius=radius, max_nn=max_nn))
+    pcd.orient_normals_consistent_tangent_plane(k=orient_k)
+    return pcd
+
+
+def reconstruct_surface(pcd, depth, density_quantile):
+    """Poisson reconstruction with low-density vertices and out-of-bounds artifacts removed"""
+    mesh_recon, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
+        pcd, depth=depth)
+
+    # Remove low-density vertices (artifacts)
+    vertices_to_remove = np.asarray(densities) < np.quantile(densities, density_quantile)
+    mesh_recon.remove_vertices_by_mask(vertices_to_remove)
+
+    # Crop the mesh using bounding box to remove artifacts
+    bbox = pcd.get_axis_aligned_bounding_box()
+    mesh_cropped = mesh_recon.crop(bbox)
+
+    # Compute normals for the reconstructed mesh
+    mesh_cropped.compute_vertex_normals()
+    return mesh_cropped
+
+
+def voxelize(pcd, voxel_size):
+    return o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=voxel_size)
+
+
+def clip_plane(pcd, axis, offset):
+    """Point and normal of an axis-aligned clipping plane through the cloud"""
+    center = pcd.get_center()
+    extent = pcd.get_max_bound() - pcd.get_min_bound()
+    plane_point = center.copy()
+    plane_point[axis] += offset * extent[axis]
+    plane_normal = np.zeros(3)
+    plane_normal[axis] = 1.0
+    return plane_point, plane_normal
+
+
+def make_plane_mesh(pcd, plane_point, axis):
+    """Thin box visualizing the cutting plane"""
+    extent = pcd.get_max_bound() - pcd.get_min_bound()
+    size = extent * 1.5
+    size[axis] = 0.002  # Very thin along the plane normal
+    plane = o3d.geometry.TriangleMesh.create_box(width=size[0], height=size[1], depth=size[2])
+    plane.translate(plane_point - plane.get_center())
+    # Color the plane red/orange to show it's a cutting plane
+    plane.paint_uniform_color([1.0, 0.3, 0.0])
+    plane.compute_vertex_normals()
+    return plane, size
+
+
+def extreme_marker(point, color):
+    sphere = o3d.geometry.TriangleMesh.create_sphere(radius=0.01)
+    sphere.translate(point)
+    sphere.paint_uniform_color(color)
+    sphere.compute_vertex_normals()
+    return sphere
+
+
+def build_lod(mesh, p, parent, cache):
+    """LOD pyramid (finest first); returns (cloud to reconstruct from, its cache key, pyramid)"""
+    pyramid, keys = [], []
+    key = parent
+    for level, budget in enumerate(lod.level_budgets(p["lod_budget"], p["lod_levels"])):
+        if pyramid:
+            compute = lambda b=budget, finer=pyramid[-1]: lod.downsample_to_budget(finer, b)
+        else:
+            compute = lambda b=budget: lod.sample_to_budget(mesh, b)
+        level_pcd, key = cache.get("lod", {"budget": budget}, key, "pcd", compute)
+        pyramid.append(level_pcd)
+        keys.append(key)
+        print(f"LOD level {level}: {len(level_pcd.points)} points (budget {budget})")
+    index = -1 if p["lod_quality"] == "preview" else 0
+    return pyramid[index], keys[index], pyramid
+
+
+def run_pipeline(model_path=DEFAULT_MODEL, params=None, headless=False, cache=None, geometry_cache=None):
+    """Run all seven steps; returns a dict with every intermediate geometry"""
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    cache = cache or StageCache(enabled=False)
+    geometry_cache = geometry_cache or GeometryCache(enabled=cache.enabled)
+
+    # STEP 1: Loading and Visualization
+    print_separator(1, "Loading and Visualization")
+    load_params = {"fallback_depth": p["fallback_depth"]}
+    mesh, source, hit = geometry_cache.load(model_path, lambda path: load_model(path, p["fallback_depth"]),
+                                            variant=load_params)
+    key = cache.key("load", load_params, source)
+    print(f"\nLoaded 3D model successfully{' (from geometry cache)' if hit else ''}!")
+    print_mesh_info(mesh, "Original Model")
+    print("\nDisplaying original mesh...")
+    show([mesh], "Step 1: Original Mesh", headless, 2)
+
+    # STEP 2: Conversion to Point Cloud
+    print_separator(2, "Conversion to Point Cloud")
+    if p["lod_budget"] > 0:
+        sampled, key, pyramid = build_lod(mesh, p, key, cache)
+    else:
+        sampled, key = cache.get("sample", {"points": p["sample_points"]}, key, "pcd",
+                                 lambda: sample_point_cloud(mesh, p["sample_points"]))
+        pyramid = [sampled]
+    print("\nConverted mesh to point cloud!")
+    print_point_cloud_info(sampled, "Point Cloud")
+    print("\nDisplaying point cloud...")
+    show([sampled], "Step 2: Point Cloud", headless, 3)
+
+    # STEP 3: Surface Reconstruction from Point Cloud
+    print_separator(3, "Surface Reconstruction from Point Cloud")
+    radius, depth = p["normal_radius"], p["poisson_depth"]
+    if p["lod_budget"] > 0:
+        scaled = lod.scaled_params(sampled, max_depth=p["max_poisson_depth"])
+        radius, depth = scaled["normal_radius"], scaled["poisson_depth"]
+        print(f"\nScaled to model: spacing {scaled['spacing']:.4g}, diagonal {scaled['diagonal']:.4g} "
+              f"-> normal radius {radius:.4g}, Poisson depth {depth}")
+    normal_params = {"radius": radius, "max_nn": p["normal_max_nn"], "orient_k": p["orient_k"]}
+    pcd, key = cache.get("normals", normal_params, key, "pcd",
+                         lambda: estimate_normals(copy.deepcopy(sampled), radius,
+                                                  p["normal_max_nn"], p["orient_k"]))
+    print(f"\nPerforming Poisson surface reconstruction (depth {depth})...")
+    mesh_cropped, _ = cache.get("poisson", {"depth": depth, "quantile": p["density_quantile"]},
+                                key, "mesh",
+                                lambda: reconstruct_surface(pcd, depth, p["density_quantile"]))
+    print("Surface reconstruction completed!")
+    print("\nArtifacts removed using crop method!")
+    print_mesh_info(mesh_cropped, "Reconstructed Mesh")
+    print("\nDisplaying reconstructed mesh...")
+    show([mesh_cropped], "Step 3: Reconstructed Mesh", headless, 4)
+
+    # STEP 4: Voxelization
+    print_separator(4, "Voxelization")
+    voxel_grid = voxelize(pcd, p["voxel_size"])
+    print("\nCreated voxel grid from point cloud!")
+    print_voxel_info(voxel_grid, "Voxel Grid")
+    print("\nDisplaying voxel grid...")
+    show([voxel_grid], "Step 4: Voxel Grid", headless, 5)
+
+    # STEP 5: Adding a Plane
+    print_separator(5, "Adding a Plane")
+    axis = p["clip_axis"]
+    plane_point, plane_normal = clip_plane(pcd, axis, p["clip_offset"])
+    plane, size = make_plane_mesh(pcd, plane_point, axis)
+    print("\nCreated a cutting plane through the object!")
+    print(f"Plane dimensions: {size[0]:.3f} x {size[1]:.3f} x {size[2]:.3f}")
+    print(f"Plane position (center): {plane_point}")
+    print("This plane shows where the object will be cut in Step 6")
+    print("\nDisplaying object with cutting plane...")
+    show([pcd, plane], "Step 5: Object with Cutting Plane", headless, 6)
+
+    # STEP 6: Surface Clipping
+    print_separator(6, "Surface Clipping")
+    pcd_clipped = clipping.clip(pcd, clipping.Plane(plane_point, plane_normal))
+    print("\nClipped point cloud (removed the positive side of the plane)!")
+    print_point_cloud_info(pcd_clipped, "Clipped Point Cloud")
+    print(f"Points removed: {len(pcd.points) - len(pcd_clipped.points)}")
+    print(f"Points remaining: {len(pcd_clipped.points)}")
+    print("\nNote: Clipping performed on point cloud.")
+    print("For mesh clipping, reconstruction would be needed.")
+    print("\nDisplaying clipped point cloud...")
+    show([pcd_clipped], "Step 6: Clipped Point Cloud", headless, 7)
+
+    # STEP 7: Working with Color and Extremes
+    print_separator(7, "Working with Color and Extremes")
+    gradient_axis = p["gradient_axis"]
+    axis_name = ['X', 'Y', 'Z'][gradient_axis]
+    pcd_colored, min_point, max_point = clipping.colorize_gradient(pcd_clipped, gradient_axis)
+    print(f"\nApplying color gradient along {axis_name}-axis...")
+    print(f"Minimum {axis_name} coordinate: {min_point[gradient_axis]:.4f} at point {min_point}")
+    print(f"Maximum {axis_name} coordinate: {max_point[gradient_axis]:.4f} at point {max_point}")
+    sphere_min = extreme_marker(min_point, [0, 1, 0])  # Green for minimum
+    sphere_max = extreme_marker(max_point, [1, 1, 0])  # Yellow for maximum
+    print(f"\nGradient applied! Colors range from blue (min) to red (max)")
+    print(f"Extreme points highlighted:")
+    print(f"  - Minimum (green sphere): {min_point}")
+    print(f"  - Maximum (yellow sphere): {max_point}")
+    print("\nDisplaying colored point cloud with extreme points...")
+    show([pcd_colored, sphere_min, sphere_max], "Step 7: Color Gradient & Extremes", headless)
+
+    if cache.enabled:
+        print(f"\nStage cache: reused {cache.hits or 'nothing'}, computed {cache.misses or 'nothing'}")
+
+    return {
+        "mesh": mesh,
+        "pcd": pcd,
+        "pyramid": pyramid,
+        "mesh_reconstructed": mesh_cropped,
+        "voxel_grid": voxel_grid,
+        "plane": plane,
+        "pcd_clipped": pcd_clipped,
+        "pcd_colored": pcd_colored,
+        "extremes": (min_point, max_point),
+    }
+
+
+def print_summary():
+    print("\n" + "="*80)
+    print("ALL 7 STEPS COMPLETED SUCCESSFULLY!")
+    print("="*80)
+    print("\nSummary:")
+    print("✓ Step 1: Loaded and visualized 3D mesh")
+    print("✓ Step 2: Converted to point cloud")
+    print("✓ Step 3: Reconstructed surface using Poisson")
+    print("✓ Step 4: Created voxel grid")
+    print("✓ Step 5: Added a plane to the scene")
+    print("✓ Step 6: Clipped surface (removed one side of the plane)")
+    print("✓ Step 7: Applied color gradient and highlighted extremes")
+    print("\nAssignment #5 Complete! Ready for defense.")
+    print("="*80 + "\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Assignment 5: mesh processing pipeline")
+    parser.add_argument("model", nargs="?", default=DEFAULT_MODEL, help="mesh or point cloud file")
+    parser.add_argument("--headless", action="store_true", help="do not open viewer windows")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every stage")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    params = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+    run_pipeline(args.model, params, headless=args.headless, cache=cache)
+    print_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Run the assignment5 pipeline over many models in parallel worker processes.
+
+    py batch_process.py "scans/*.ply" Koenigsegg.obj --workers 4
+
+Each model runs headless in a fresh process of its own (at most `--workers`
+at a time), so the reported peak memory is per model and is released when the
+model is done. Outputs go to `<output-dir>/<model>/` together with the model's
+console log; `batch_report.json` summarizes timing, peak memory and failures.
+A worker killed mid-model (OOM killer, segfault) is reported as that model's
+failure with its exit code.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows: peak working set via the Win32 API instead
+    resource = None
+
+from assignment5 import CACHE_DIR, DEFAULT_PARAMS, MODEL_DIR, StageCache, run_pipeline
+
+OUTPUT_DIR = os.path.join(MODEL_DIR, "outputs")
+
+
+def _windows_peak_bytes():
+    """Peak working set of this process (GetProcessMemoryInfo), or None"""
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.WinDLL("kernel32")
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi = ctypes.WinDLL("psapi")
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def peak_rss_mb():
+    if resource is None:
+        try:
+            peak = _windows_peak_bytes()
+        except (AttributeError, OSError):
+            return None
+        return None if peak is None else round(peak / 2**20, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def write_outputs(result, out_dir):
+    import open3d as o3d
+
+    files = {
+        "mesh_reconstructed.ply": lambda p: o3d.io.write_triangle_mesh(p, result["mesh_reconstructed"]),
+        "voxel_grid.ply": lambda p: o3d.io.write_voxel_grid(p, result["voxel_grid"]),
+        "pcd_clipped.ply": lambda p: o3d.io.write_point_cloud(p, result["pcd_clipped"]),
+        "pcd_colored.ply": lambda p: o3d.io.write_point_cloud(p, result["pcd_colored"]),
+    }
+    if len(result["pyramid"]) > 1:
+        for level, level_pcd in enumerate(result["pyramid"]):
+            files[f"lod_{level}.ply"] = lambda p, pcd=level_pcd: o3d.io.write_point_cloud(p, pcd)
+    written = []
+    for name, write in files.items():
+        path = os.path.join(out_dir, name)
+        if not write(path):
+            raise RuntimeError(f"Failed to write {path}")
+        written.append(name)
+    return written
+
+
+def process_model(task):
+    """Worker: run one model end to end; never raises"""
+    path, out_dir, params, cache_dir = task
+    os.makedirs(out_dir, exist_ok=True)
+    report = {"model": path, "output_dir": out_dir, "ok": False, "seconds": None,
+              "peak_rss_mb": None, "outputs": [], "error": None}
+    start = time.perf_counter()
+    with open(os.path.join(out_dir, "log.txt"), "w", encoding="utf-8") as log:
+        with contextlib.redirect_stdout(log):
+            try:
+                cache = StageCache(cache_dir, enabled=cache_dir is not None)
+                result = run_pipeline(path, params, headless=True, cache=cache)
+                report["outputs"] = write_outputs(result, out_dir)
+                report["cache_hits"] = cache.hits
+                report["ok"] = True
+            except Exception as e:
+                report["error"] = f"{type(e).__name__}: {e}"
+                traceback.print_exc(file=log)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def expand_models(patterns):
+    models = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else [])
+        if not matches:
+            print(f"No files match {pattern}")
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in models:
+                models.append(path)
+    return models
+
+
+def output_dirs(models, output_dir):
+    """One directory per model, named after the file (suffixed on collisions)"""
+    dirs = []
+    used = set()
+    for path in models:
+        name = os.path.basename(path).replace(".", "_")
+        candidate, n = name, 2
+        while candidate in used:
+            candidate, n = f"{name}_{n}", n + 1
+        used.add(candidate)
+        dirs.append(os.path.join(output_dir, candidate))
+    return dirs
+
+
+def _model_process(task, conn):
+    """Child process entry point: run one model and send its report to the parent"""
+    conn.send(process_model(task))
+    conn.close()
+
+
+def _dead_worker_report(task, exitcode):
+    path, out_dir, _, _ = task
+    return {"model": path, "output_dir": out_dir, "ok": False, "seconds": None,
+            "peak_rss_mb": None, "outputs": [],
+            "error": f"worker process died with exit code {exitcode} (killed or crashed); "
+                     f"see log.txt for progress"}
+
+
+def _run_processes(tasks, workers, on_report):
+    """Run each task in its own short-lived process, at most `workers` at once"""
+    pending = list(tasks)
+    running = {}  # result pipe -> (process, task)
+    while pending or running:
+        while pending and len(running) < workers:
+            task = pending.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            proc = multiprocessing.Process(target=_model_process, args=(task, sender))
+            proc.start()
+            sender.close()  # the child holds the only write end, so its death reads as EOF
+            running[receiver] = (proc, task)
+        for receiver in multiprocessing.connection.wait(list(running)):
+            proc, task = running.pop(receiver)
+            try:
+                report = receiver.recv()
+            except EOFError:
+                report = None
+            receiver.close()
+            proc.join()
+            on_report(report if report is not None else _dead_worker_report(task, proc.exitcode))
+
+
+def run_batch(models, output_dir=OUTPUT_DIR, params=None, workers=None, cache_dir=CACHE_DIR):
+    tasks = [(path, out, params or {}, cache_dir) for path, out in zip(models, output_dirs(models, output_dir))]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    print(f"Processing {len(tasks)} models with {workers} workers...")
+    start = time.perf_counter()
+    reports = []
+
+    def on_report(report):
+        status = "ok" if report["ok"] else f"FAILED ({report['error']})"
+        seconds = f" in {report['seconds']:.1f}s" if report["seconds"] is not None else ""
+        memory = f", peak {report['peak_rss_mb']} MB" if report["peak_rss_mb"] is not None else ""
+        print(f"  {os.path.basename(report['model'])}: {status}{seconds}{memory}")
+        reports.append(report)
+
+    _run_processes(tasks, workers, on_report)
+    elapsed = time.perf_counter() - start
+    failed = [r for r in reports if not r["ok"]]
+    summary = {
+        "models": len(reports),
+        "failed": len(failed),
+        "workers": workers,
+        "wall_seconds": round(elapsed, 3),
+        "cpu_seconds": round(sum(r["seconds"] or 0 for r in reports), 3),
+        "params": dict(DEFAULT_PARAMS, **(params or {})),
+        "results": sorted(reports, key=lambda r: r["model"]),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "batch_report.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"\nDone: {len(reports) - len(failed)}/{len(reports)} models in {elapsed:.1f}s "
+          f"(sum of per-model time {summary['cpu_seconds']:.1f}s); "
+          f"report: {os.path.join(output_dir, 'batch_report.json')}")
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch-process 3D models through the assignment5 pipeline")
+    parser.add_argument("models", nargs="+", help="model files or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="recompute every stage")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=default)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    models = expand_models(args.models)
+    if not models:
+        return 1
+    params = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+    summary = run_batch(models, args.output_dir, params, args.workers,
+                        cache_dir=None if args.no_cache else args.cache_dir)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
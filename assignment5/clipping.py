@@ -0,0 +1,264 @@
+"""Vectorized clipping and gradient coloring for point clouds.
+
+Regions (planes, axis-aligned boxes, general half-space intersections and
+intersections of those) turn an (N, 3) point array into a keep-mask.
+In-memory clouds are clipped with `select_by_index`, which carries points,
+normals and colors over without deep-copying the source cloud.
+
+For clouds larger than RAM, `clip_colorize_chunked` streams memory-mapped
+arrays (e.g. from `geometry_cache`) in two passes: the first counts kept
+points and finds the gradient extremes, the second writes the kept points,
+their attributes and gradient colors into `.npy` memmaps of the exact size.
+Only the first conversion of a model into the geometry cache reads it whole
+through Open3D; every later run works on the memory-mapped arrays.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import open3d as o3d
+
+CHUNK_POINTS = 1 << 20
+
+
+class Plane:
+    """Keeps points on the negative side: dot(p - point, normal) < 0"""
+
+    def __init__(self, point, normal):
+        self.point = np.asarray(point, dtype=np.float64)
+        self.normal = np.asarray(normal, dtype=np.float64)
+
+    def mask(self, points):
+        return (points - self.point) @ self.normal < 0
+
+
+class Box:
+    """Keeps points inside an axis-aligned box (bounds inclusive)"""
+
+    def __init__(self, min_bound, max_bound):
+        self.min_bound = np.asarray(min_bound, dtype=np.float64)
+        self.max_bound = np.asarray(max_bound, dtype=np.float64)
+
+    def mask(self, points):
+        return np.all((points >= self.min_bound) & (points <= self.max_bound), axis=1)
+
+
+class HalfSpaces:
+    """Keeps points with A @ p <= b for every row (a convex polytope)"""
+
+    def __init__(self, A, b):
+        self.A = np.atleast_2d(np.asarray(A, dtype=np.float64))
+        self.b = np.asarray(b, dtype=np.float64).reshape(-1)
+
+    @classmethod
+    def from_planes(cls, planes):
+        """Intersection of several planes' kept sides as one matrix test"""
+        A = np.array([p.normal for p in planes])
+        b = np.array([p.normal @ p.point for p in planes])
+        # A @ p <= b also keeps points exactly on a plane, unlike Plane.mask
+        return cls(A, b)
+
+    def mask(self, points):
+        return np.all(points @ self.A.T <= self.b, axis=1)
+
+
+class Intersection:
+    """Keeps points inside every region"""
+
+    def __init__(self, *regions):
+        self.regions = regions
+
+    def mask(self, points):
+        keep = np.ones(len(points), dtype=bool)
+        for region in self.regions:
+            keep &= region.mask(points)
+        return keep
+
+
+class Invert:
+    """Keeps the points a region would drop"""
+
+    def __init__(self, region):
+        self.region = region
+
+    def mask(self, points):
+        return ~self.region.mask(points)
+
+
+def clip(pcd, region):
+    """New cloud with the points of `pcd` inside `region`, keeping normals and colors"""
+    keep = region.mask(np.asarray(pcd.points))
+    return pcd.select_by_index(np.flatnonzero(keep).tolist())
+
+
+def gradient_colors(values, lo, hi, out=None):
+    """Blue (lo) to red (hi) colors for `values`, written into `out` if given"""
+    span = hi - lo
+    t = (values - lo) / span if span > 0 else np.zeros(len(values))
+    if out is None:
+        out = np.empty((len(values), 3))
+    out[:, 0] = t       # Red channel increases along the axis
+    out[:, 1] = 0
+    out[:, 2] = 1 - t   # Blue channel decreases along the axis
+    return out
+
+
+def colorize_gradient(pcd, axis):
+    """Gradient-colored cloud along `axis`; returns (cloud, min point, max point)
+
+    The result shares no storage with `pcd` but copies only points and normals;
+    any existing colors are replaced rather than copied first.
+    """
+    points = np.asarray(pcd.points)
+    values = points[:, axis]
+    min_idx = int(np.argmin(values))
+    max_idx = int(np.argmax(values))
+
+    colored = o3d.geometry.PointCloud()
+    colored.points = pcd.points
+    if pcd.has_normals():
+        colored.normals = pcd.normals
+    colored.colors = o3d.utility.Vector3dVector(gradient_colors(values, values[min_idx], values[max_idx]))
+    return colored, points[min_idx].copy(), points[max_idx].copy()
+
+
+def _chunks(n, chunk_size):
+    for start in range(0, n, chunk_size):
+        yield start, min(start + chunk_size, n)
+
+
+def clip_colorize_chunked(arrays, region, out_dir, gradient_axis=None, chunk_size=CHUNK_POINTS):
+    """Stream-clip (N, 3) arrays and optionally gradient-color the kept points
+
+    `arrays` maps names ("points" required, plus e.g. "normals", "colors") to
+    equally long arrays, typically read-only memmaps. Kept rows are written to
+    `<out_dir>/<name>.npy`; with `gradient_axis` the "colors" output holds the
+    gradient instead of the input colors. Returns
+    {"count", "files", "min_point", "max_point"} (extremes along the axis).
+    """
+    points = arrays["points"]
+    n = len(points)
+
+    # Pass 1: count kept points and find the extremes along the gradient axis
+    count = 0
+    lo = hi = None
+    min_point = max_point = None
+    for start, end in _chunks(n, chunk_size):
+        chunk = np.asarray(points[start:end], dtype=np.float64)
+        keep = region.mask(chunk)
+        count += int(keep.sum())
+        if gradient_axis is not None and keep.any():
+            kept = chunk[keep]
+            values = kept[:, gradient_axis]
+            i, j = int(np.argmin(values)), int(np.argmax(values))
+            if lo is None or values[i] < lo:
+                lo, min_point = values[i], kept[i].copy()
+            if hi is None or values[j] > hi:
+                hi, max_point = values[j], kept[j].copy()
+
+    # Pass 2: write kept rows straight into exactly sized output memmaps
+    os.makedirs(out_dir, exist_ok=True)
+    names = list(arrays)
+    if gradient_axis is not None and "colors" not in names:
+        names.append("colors")
+    outputs = {}
+    for name in names:
+        source = arrays.get(name)
+        gradient = name == "colors" and gradient_axis is not None
+        dtype = np.float64 if source is None or gradient else source.dtype
+        shape = (count, 3) if source is None or gradient else (count,) + source.shape[1:]
+        path = os.path.join(out_dir, f"{name}.npy")
+        if count == 0:
+            # An empty file cannot be memory-mapped
+            np.save(path, np.empty(shape, dtype=dtype))
+            continue
+        outputs[name] = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    pos = 0
+    for start, end in _chunks(n if count else 0, chunk_size):
+        chunk = np.asarray(points[start:end], dtype=np.float64)
+        keep = region.mask(chunk)
+        kept = int(keep.sum())
+        if not kept:
+            continue
+        for name, out in outputs.items():
+            target = out[pos:pos + kept]
+            if name == "colors" and gradient_axis is not None:
+                gradient_colors(chunk[keep, gradient_axis], lo, hi, out=target)
+            elif name == "points":
+                target[:] = chunk[keep]
+            else:
+                target[:] = arrays[name][start:end][keep]
+        pos += kept
+
+    for out in outputs.values():
+        out.flush()
+    return {
+        "count": count,
+        "files": {name: os.path.join(out_dir, f"{name}.npy") for name in names},
+        "min_point": min_point,
+        "max_point": max_point,
+    }
+
+
+def streaming_bounds(points, chunk_size=CHUNK_POINTS):
+    """(min, max) corners of an (N, 3) array, read one chunk at a time"""
+    lo = np.full(3, np.inf)
+    hi = np.full(3, -np.inf)
+    for start, end in _chunks(len(points), chunk_size):
+        chunk = np.asarray(points[start:end])
+        lo = np.minimum(lo, chunk.min(axis=0))
+        hi = np.maximum(hi, chunk.max(axis=0))
+    return lo, hi
+
+
+# Geometry cache array names -> clip array names
+MESH_ATTRIBUTES = {"vertices": "points", "vertex_normals": "normals", "vertex_colors": "colors"}
+
+
+def load_geometry(path):
+    """The file as stored: a mesh if it has triangles, else its point cloud (no Poisson)"""
+    mesh = o3d.io.read_triangle_mesh(path)
+    if len(mesh.triangles):
+        return mesh
+    pcd = o3d.io.read_point_cloud(path)
+    if len(pcd.points) == 0:
+        raise RuntimeError(f"Could not load model {path}. Please check the file.")
+    return pcd
+
+
+def main():
+    from assignment5 import DEFAULT_PARAMS
+    from geometry_cache import GeometryCache
+
+    parser = argparse.ArgumentParser(description="Out-of-core plane clip and gradient coloring")
+    parser.add_argument("model", help="mesh or point cloud file (converted through the geometry cache; "
+                                      "the first conversion loads it into memory once)")
+    parser.add_argument("--out-dir", default=None, help="output directory (default: <model>_clipped)")
+    parser.add_argument("--clip-axis", type=int, default=DEFAULT_PARAMS["clip_axis"])
+    parser.add_argument("--clip-offset", type=float, default=DEFAULT_PARAMS["clip_offset"])
+    parser.add_argument("--gradient-axis", type=int, default=DEFAULT_PARAMS["gradient_axis"])
+    parser.add_argument("--chunk-points", type=int, default=CHUNK_POINTS)
+    args = parser.parse_args()
+
+    # Point clouds are cached as their original points, not the pipeline's Poisson mesh
+    kind, cached = GeometryCache().arrays(args.model, load_geometry, variant={"loader": "as_stored"})
+    arrays = {MESH_ATTRIBUTES.get(name, name): data for name, data in cached.items()
+              if kind == "pcd" or name in MESH_ATTRIBUTES}
+
+    lo, hi = streaming_bounds(arrays["points"], args.chunk_points)
+    # Same plane as the pipeline's Step 6, from the bounding box center
+    point = (lo + hi) / 2
+    point[args.clip_axis] += args.clip_offset * (hi - lo)[args.clip_axis]
+    normal = np.zeros(3)
+    normal[args.clip_axis] = 1.0
+
+    out_dir = args.out_dir or os.path.splitext(args.model)[0] + "_clipped"
+    result = clip_colorize_chunked(arrays, Plane(point, normal), out_dir,
+                                   gradient_axis=args.gradient_axis, chunk_size=args.chunk_points)
+    print(f"Kept {result['count']} of {len(arrays['points'])} points -> {out_dir}")
+    print(f"Minimum: {result['min_point']}  Maximum: {result['max_point']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Binary geometry cache for fast model loading.
+
+The first load of a model parses it with Open3D (including the Poisson
+fallback for point-cloud-only files) and stores the vertex, triangle, normal
+and color arrays as `.npy` files plus a `manifest.json`. Later loads
+memory-map those arrays instead of re-parsing text formats such as OBJ.
+
+An entry is reused while the source file's size and mtime are unchanged; if
+they changed but the SHA-256 still matches (e.g. the file was touched or
+copied), the manifest is refreshed and the entry kept.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import open3d as o3d
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+GEOMETRY_CACHE_DIR = os.path.join(MODEL_DIR, ".geometry_cache")
+MANIFEST = "manifest.json"
+
+# array name -> (geometry attribute, dtype Open3D stores it as)
+MESH_ARRAYS = {
+    "vertices": ("vertices", np.float64),
+    "triangles": ("triangles", np.int32),
+    "vertex_normals": ("vertex_normals", np.float64),
+    "vertex_colors": ("vertex_colors", np.float64),
+}
+POINT_CLOUD_ARRAYS = {
+    "points": ("points", np.float64),
+    "normals": ("normals", np.float64),
+    "colors": ("colors", np.float64),
+}
+VECTOR_TYPES = {np.float64: o3d.utility.Vector3dVector, np.int32: o3d.utility.Vector3iVector}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _layout(geometry):
+    if isinstance(geometry, o3d.geometry.TriangleMesh):
+        return "mesh", MESH_ARRAYS
+    return "pcd", POINT_CLOUD_ARRAYS
+
+
+def save_arrays(geometry, entry_dir):
+    """Write a mesh's or point cloud's attribute arrays as .npy; returns (kind, array specs)"""
+    kind, layout = _layout(geometry)
+    arrays = {}
+    for name, (attr, dtype) in layout.items():
+        data = np.asarray(getattr(geometry, attr), dtype=dtype)
+        if len(data) == 0:
+            continue
+        tmp = os.path.join(entry_dir, f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp, data)
+        os.replace(tmp, os.path.join(entry_dir, f"{name}.npy"))
+        arrays[name] = {"shape": list(data.shape), "dtype": np.dtype(dtype).name}
+    return kind, arrays
+
+
+def load_arrays(entry_dir, arrays):
+    """Memory-map the cached arrays (read-only, no parsing)"""
+    return {name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode="r") for name in arrays}
+
+
+def to_open3d(kind, arrays):
+    """Build an Open3D geometry from cached arrays"""
+    geometry = o3d.geometry.TriangleMesh() if kind == "mesh" else o3d.geometry.PointCloud()
+    layout = MESH_ARRAYS if kind == "mesh" else POINT_CLOUD_ARRAYS
+    for name, data in arrays.items():
+        attr, dtype = layout[name]
+        # Open3D keeps its own storage, so this is one contiguous copy per array
+        setattr(geometry, attr, VECTOR_TYPES[dtype](data))
+    return geometry
+
+
+class GeometryCache:
+    """Source file (+ loader variant) -> memory-mapped geometry arrays
+
+    Each entry lives in its own directory with its own manifest, so batch
+    workers loading different models never contend for a shared file.
+    """
+
+    def __init__(self, cache_dir=GEOMETRY_CACHE_DIR, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+
+    def entry_dir(self, path, variant):
+        ident = json.dumps({"source": os.path.abspath(path), "variant": variant}, sort_keys=True)
+        return os.path.join(self.cache_dir, hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16])
+
+    def _valid_manifest(self, path, entry_dir):
+        """The entry's manifest if it still matches the source file, else None"""
+        manifest_path = os.path.join(entry_dir, MANIFEST)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        st = os.stat(path)
+        if manifest["size"] == st.st_size and manifest["mtime"] == st.st_mtime:
+            return manifest
+        if manifest["size"] != st.st_size or manifest["sha256"] != file_hash(path):
+            return None
+        manifest["mtime"] = st.st_mtime
+        self._write_manifest(entry_dir, manifest)
+        return manifest
+
+    @staticmethod
+    def _write_manifest(entry_dir, manifest):
+        tmp = os.path.join(entry_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, os.path.join(entry_dir, MANIFEST))
+
+    def _build(self, path, loader, variant, entry_dir):
+        """Parse the source with `loader` and store it; returns (manifest, geometry)"""
+        st = os.stat(path)
+        sha256 = file_hash(path)
+        geometry = loader(path)
+        os.makedirs(entry_dir, exist_ok=True)
+        # Drop the old manifest first so a crash mid-write leaves no valid-looking entry
+        try:
+            os.remove(os.path.join(entry_dir, MANIFEST))
+        except OSError:
+            pass
+        kind, arrays = save_arrays(geometry, entry_dir)
+        manifest = {
+            "source": os.path.abspath(path),
+            "variant": variant,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": sha256,
+            "kind": kind,
+            "arrays": arrays,
+        }
+        self._write_manifest(entry_dir, manifest)
+        return manifest, geometry
+
+    def load(self, path, loader, variant=None):
+        """Return (geometry, source sha256, hit); `loader(path)` runs on a miss"""
+        if not self.enabled:
+            return loader(path), file_hash(path), False
+        entry_dir = self.entry_dir(path, variant)
+        manifest = self._valid_manifest(path, entry_dir)
+        if manifest is not None:
+            arrays = load_arrays(entry_dir, manifest["arrays"])
+            return to_open3d(manifest["kind"], arrays), manifest["sha256"], True
+        manifest, geometry = self._build(path, loader, variant, entry_dir)
+        return geometry, manifest["sha256"], False
+
+    def arrays(self, path, loader, variant=None):
+        """Return (kind, memory-mapped arrays) without building an Open3D geometry"""
+        entry_dir = self.entry_dir(path, variant)
+        manifest = self._valid_manifest(path, entry_dir)
+        if manifest is None:
+            manifest, _ = self._build(path, loader, variant, entry_dir)
+        return manifest["kind"], load_arrays(entry_dir, manifest["arrays"])
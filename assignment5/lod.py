@@ -0,0 +1,77 @@
+"""Level-of-detail preprocessing for the assignment5 pipeline.
+
+Large inputs are reduced to a point budget by voxel downsampling (which keeps
+the surface evenly covered, unlike dropping points at random). Normal-search
+radius and Poisson depth are then derived from the resulting point spacing,
+so runtime and memory follow the budget rather than the input size.
+"""
+
+import math
+
+import numpy as np
+
+OVERSAMPLE = 4          # sample this many times the budget before downsampling
+MIN_DEPTH = 6
+MAX_DEPTH = 10
+RADIUS_FACTOR = 3.0     # normal radius in units of mean point spacing
+PYRAMID_RATIO = 4       # budget ratio between pyramid levels
+
+
+def bbox_diagonal(geometry):
+    bbox = geometry.get_axis_aligned_bounding_box()
+    return float(np.linalg.norm(bbox.get_max_bound() - bbox.get_min_bound()))
+
+
+def downsample_to_budget(pcd, budget, tolerance=0.1, max_iter=8):
+    """Voxel-downsample `pcd` to at most `budget` points (within `tolerance` below it)"""
+    n = len(pcd.points)
+    if n <= budget:
+        return pcd
+    # Surface samples: point count scales with 1/voxel^2
+    voxel = bbox_diagonal(pcd) / math.sqrt(budget)
+    best = None
+    for _ in range(max_iter):
+        down = pcd.voxel_down_sample(voxel)
+        count = len(down.points)
+        if count <= budget:
+            if best is None or count > len(best.points):
+                best = down
+            if count >= budget * (1 - tolerance):
+                break
+        voxel *= math.sqrt(count / budget)
+    if best is None:
+        # Never got under budget; keep an even subset of the last attempt
+        best = down.uniform_down_sample(math.ceil(len(down.points) / budget))
+    return best
+
+
+def sample_to_budget(mesh, budget, oversample=OVERSAMPLE):
+    """Evenly spaced cloud of about `budget` points covering the mesh surface"""
+    pcd = mesh.sample_points_uniformly(number_of_points=budget * oversample)
+    return downsample_to_budget(pcd, budget)
+
+
+def level_budgets(budget, levels, ratio=PYRAMID_RATIO):
+    """Point budgets of a pyramid, finest first"""
+    return [max(1, budget // ratio ** k) for k in range(levels)]
+
+
+def mean_spacing(pcd):
+    return float(np.mean(pcd.compute_nearest_neighbor_distance()))
+
+
+def scaled_params(pcd, radius_factor=RADIUS_FACTOR, min_depth=MIN_DEPTH, max_depth=MAX_DEPTH):
+    """Normal radius and Poisson depth matched to the cloud's size and density
+
+    The octree depth is chosen so a leaf cell is about one point spacing
+    across; deeper only adds triangles the samples cannot support.
+    """
+    spacing = mean_spacing(pcd)
+    diagonal = bbox_diagonal(pcd)
+    depth = math.ceil(math.log2(diagonal / spacing)) if spacing > 0 else max_depth
+    return {
+        "normal_radius": radius_factor * spacing,
+        "poisson_depth": int(min(max(depth, min_depth), max_depth)),
+        "spacing": spacing,
+        "diagonal": diagonal,
+    }
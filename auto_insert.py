@@ -1,10 +1,31 @@
 #!/usr/bin/env python3
-"""Auto-insert script: adds new F1 race results every 10 seconds."""
+"""Auto-insert script: adds new F1 race results every 10 seconds.
 
+With `--batch` it becomes a load generator that writes synthetic results in
+batches at a target rate, for soak-testing the dashboards.
+"""
+
+import argparse
+import io
+import multiprocessing
+import queue
 import time
 import random
 from connection import F1DatabaseConnector
 from datetime import datetime
+from psycopg2 import errors
+from psycopg2.extras import execute_values
+
+POINTS_BY_POSITION = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+RESULT_COLUMNS = (
+    "resultid", "raceid", "driverid", "constructorid",
+    "number", "grid", "position", "positiontext", "positionorder",
+    "points", "laps", "time", "milliseconds",
+    "fastestlap", "rank", "fastestlaptime", "fastestlapspeed", "statusid",
+)
+ID_SEQUENCE = "results_loadgen_seq"
+UNIQUE_INDEX = "results_raceid_driverid_uq"
+MAX_PICK_ATTEMPTS = 50
 
 def get_random_race_data(connector):
     """Get random valid data for inserting results."""
@@ -66,7 +87,7 @@ def get_random_race_data(connector):
         'status_id': status_id
     }
 
-def insert_new_result(connector):
+def insert_new_result(connector, conflict_target="(raceid, driverid)"):
     """Insert a new race result."""
     data = get_random_race_data(connector)
     if not data:
@@ -85,10 +106,8 @@ def insert_new_result(connector):
     milliseconds = random.randint(5400000, 6000000)  # ~90-100 minutes
     
     try:
-        # Get next resultId
-        cur.execute("SELECT MAX(resultid) FROM results")
-        max_id = cur.fetchone()[0]
-        next_id = (max_id or 0) + 1
+        # Sequence-backed id, safe when several inserters run at once
+        next_id = reserve_ids(cur, 1)[0]
         
         cur.execute("""
             INSERT INTO results (
@@ -102,16 +121,21 @@ def insert_new_result(connector):
                 %s, %s, NULL, %s,
                 NULL, NULL, NULL, NULL, %s
             )
+            ON CONFLICT """ + conflict_target + """ DO NOTHING
         """, (
             next_id, data['race_id'], data['driver_id'], data['constructor_id'],
             random.randint(1, 99), grid, position, str(position), position,
             points_value, laps, milliseconds,
             data['status_id']
         ))
+        inserted = cur.rowcount
         
         connector.connection.commit()
         cur.close()
         
+        if not inserted:
+            print(f"⚠️  Driver {data['driver_id']} already has a result in Race {data['race_id']}; skipped")
+            return False
         print(f"✅ Inserted result #{next_id}: Driver {data['driver_id']} in Race {data['race_id']}, "
               f"Position {position}, Points {points_value}")
         return True
@@ -122,7 +146,366 @@ def insert_new_result(connector):
         print(f"❌ Error inserting result: {e}")
         return False
 
+class IdPools:
+    """In-memory pools of valid ids so batch mode never queries per row."""
+
+    def __init__(self, connector, min_year=2020):
+        cur = connector.connection.cursor()
+        cur.execute("SELECT raceid FROM races WHERE year >= %s", (min_year,))
+        self.race_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT driverid FROM drivers")
+        self.driver_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT constructorid FROM constructors")
+        self.constructor_ids = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT statusid FROM status WHERE status = 'Finished' LIMIT 1")
+        self.status_id = cur.fetchone()[0]
+        # Existing (race, driver) pairs, so we keep the one-result-per-driver rule
+        cur.execute("""
+            SELECT r.raceid, r.driverid
+            FROM results r
+            JOIN races ra ON ra.raceid = r.raceid
+            WHERE ra.year >= %s
+        """, (min_year,))
+        self.used_pairs = set(cur.fetchall())
+        cur.close()
+        connector.connection.commit()
+
+    def capacity(self):
+        return len(self.race_ids) * len(self.driver_ids) - len(self.used_pairs)
+
+    def pick(self):
+        """Return an unused (race_id, driver_id, constructor_id), or None when exhausted."""
+        if not self.race_ids or not self.driver_ids:
+            return None
+        for _ in range(MAX_PICK_ATTEMPTS):
+            pair = (random.choice(self.race_ids), random.choice(self.driver_ids))
+            if pair not in self.used_pairs:
+                self.used_pairs.add(pair)
+                return pair + (random.choice(self.constructor_ids),)
+        return None
+
+
+def ensure_id_sequence(connector):
+    """Create the id sequence used by batch mode and move it past MAX(resultid)."""
+    cur = connector.connection.cursor()
+    cur.execute(f"CREATE SEQUENCE IF NOT EXISTS {ID_SEQUENCE}")
+    # Serialise the catch-up so two starting generators cannot move it backwards
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (ID_SEQUENCE,))
+    cur.execute(f"""
+        SELECT setval('{ID_SEQUENCE}', m)
+        FROM (SELECT COALESCE(MAX(resultid), 0) AS m FROM results) s
+        -- Compare with the id nextval would hand out next: a fresh sequence
+        -- (is_called = false) returns last_value itself, not last_value + 1
+        WHERE m >= (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END
+                    FROM {ID_SEQUENCE})
+    """)
+    connector.connection.commit()
+    cur.close()
+
+
+def ensure_unique_rule(connector):
+    """Back the one-result-per-(race, driver) rule with a unique index for ON CONFLICT.
+
+    Historic Kaggle data contains a few shared drives with two results for the
+    same driver in one race; in that case the index only covers rows added from
+    now on, and pre-existing pairs are filtered client-side by IdPools.
+
+    Returns the ON CONFLICT target that matches the index (including the
+    partial index's predicate), so only (race, driver) clashes are skipped and
+    a resultid collision still raises.
+    """
+    cur = connector.connection.cursor()
+    try:
+        target = _unique_rule_target(cur)
+        if target:
+            return target
+        try:
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_INDEX} ON results (raceid, driverid)")
+            connector.connection.commit()
+        except errors.UniqueViolation:
+            connector.connection.rollback()
+            cur.execute("SELECT COALESCE(MAX(resultid), 0) FROM results")
+            boundary = cur.fetchone()[0]
+            cur.execute(f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_INDEX}_new
+                ON results (raceid, driverid) WHERE resultid > {int(boundary)}
+            """)
+            connector.connection.commit()
+            print(f"Existing results contain duplicate (race, driver) pairs; "
+                  f"unique rule applies to results after #{boundary}")
+        return _unique_rule_target(cur)
+    finally:
+        cur.close()
+
+
+def _unique_rule_target(cur):
+    """ON CONFLICT target for the existing unique rule index, or None if there is none."""
+    cur.execute("""
+        SELECT pg_get_expr(i.indpred, i.indrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname IN (%s, %s)
+        ORDER BY c.relname
+        LIMIT 1
+    """, (UNIQUE_INDEX, UNIQUE_INDEX + "_new"))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    predicate = row[0]
+    return "(raceid, driverid)" + (f" WHERE {predicate}" if predicate else "")
+
+
+def reserve_ids(cur, count):
+    """Reserve a block of `count` result ids from the sequence."""
+    cur.execute(f"SELECT nextval('{ID_SEQUENCE}') FROM generate_series(1, %s)", (count,))
+    return [r[0] for r in cur.fetchall()]
+
+
+def synthetic_result(result_id, race_id, driver_id, constructor_id, status_id):
+    """Build one results row in RESULT_COLUMNS order."""
+    position = random.randint(1, 20)
+    points_value = POINTS_BY_POSITION[position - 1] if position <= 10 else 0
+    return (
+        result_id, race_id, driver_id, constructor_id,
+        random.randint(1, 99), random.randint(1, 20), position, str(position), position,
+        points_value, random.randint(50, 70), None, random.randint(5400000, 6000000),
+        None, None, None, None, status_id,
+    )
+
+
+def write_batch(cur, rows, method="values", conflict_target="(raceid, driverid)"):
+    """Insert `rows` with one execute_values statement or one COPY; return rows written.
+
+    Rows that hit the (race, driver) unique rule are skipped via ON CONFLICT
+    `conflict_target` (see ensure_unique_rule), so the return value can be
+    lower than `len(rows)`; any other violation, e.g. a resultid collision,
+    raises. COPY has no ON CONFLICT, so that method copies into a session temp
+    table and inserts from there.
+    """
+    columns = ", ".join(RESULT_COLUMNS)
+    if method == "copy":
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS results_batch (LIKE results)")
+        cur.execute("TRUNCATE results_batch")
+        buf = io.StringIO()
+        for row in rows:
+            buf.write("\t".join("\\N" if v is None else str(v) for v in row) + "\n")
+        buf.seek(0)
+        cur.copy_from(buf, "results_batch", columns=RESULT_COLUMNS, null="\\N")
+        cur.execute(f"INSERT INTO results ({columns}) SELECT {columns} FROM results_batch "
+                    f"ON CONFLICT {conflict_target} DO NOTHING")
+        return cur.rowcount
+    execute_values(
+        cur,
+        f"INSERT INTO results ({columns}) VALUES %s ON CONFLICT {conflict_target} DO NOTHING",
+        rows,
+        page_size=len(rows),
+    )
+    return cur.rowcount
+
+
+def run_batch_mode(connector, rate=1000.0, batch_size=500, commit_every=1,
+                   method="values", total=None, duration=None, min_year=2020, label=""):
+    """Insert synthetic results in batches at `rate` rows/second (0 = unthrottled).
+
+    Stops after `total` rows or `duration` seconds, when the pool of free
+    (race, driver) pairs runs out, or on Ctrl+C. Returns a stats dict with
+    inserted/conflict counts.
+    """
+    pools = IdPools(connector, min_year=min_year)
+    ensure_id_sequence(connector)
+    conflict_target = ensure_unique_rule(connector)
+    print(f"{label}Loaded {len(pools.race_ids)} races, {len(pools.driver_ids)} drivers, "
+          f"{len(pools.constructor_ids)} constructors; {pools.capacity()} free (race, driver) pairs")
+
+    cur = connector.connection.cursor()
+    inserted = 0
+    attempted = 0
+    batches = 0
+    start = time.perf_counter()
+    last_report = start
+    try:
+        while True:
+            size = batch_size if total is None else min(batch_size, total - inserted)
+            if size <= 0:
+                break
+            picks = [p for p in (pools.pick() for _ in range(size)) if p]
+            if not picks:
+                print("⚠️  No free (race, driver) pairs left; stopping")
+                break
+            ids = reserve_ids(cur, len(picks))
+            rows = [synthetic_result(rid, race, driver, constructor, pools.status_id)
+                    for rid, (race, driver, constructor) in zip(ids, picks)]
+            inserted += write_batch(cur, rows, method, conflict_target)
+            attempted += len(rows)
+            batches += 1
+            if batches % commit_every == 0:
+                connector.connection.commit()
+
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                print(f"{label}📊 {inserted} rows | {inserted / (now - start):,.0f} rows/s | "
+                      f"{attempted - inserted} conflicts")
+                last_report = now
+            if duration is not None and now - start >= duration:
+                break
+            # Pace against the absolute schedule so sleep jitter does not accumulate
+            if rate:
+                delay = start + attempted / rate - now
+                if delay > 0:
+                    time.sleep(delay)
+    except KeyboardInterrupt:
+        print(f"\n{label}🛑 Load generation stopped")
+    finally:
+        connector.connection.commit()
+        cur.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{label}Inserted {inserted} rows in {batches} batches over {elapsed:.1f}s "
+          f"({inserted / elapsed if elapsed else 0:,.0f} rows/s, {attempted - inserted} conflicts)")
+    return {"inserted": inserted, "attempted": attempted, "batches": batches, "seconds": elapsed}
+
+
+def _batch_worker(index, options, results):
+    """Process entry point: one connection and one batch loop per worker.
+
+    Always reports `(index, stats)` with stats["error"] set on failure, so the
+    parent never waits on a worker that gave up.
+    """
+    stats = {"error": "could not connect to database"}
+    try:
+        connector = F1DatabaseConnector(quiet=True)
+        if connector.connect():
+            try:
+                # Different seeds keep workers from proposing the same pairs in lockstep
+                random.seed()
+                stats = run_batch_mode(connector, label=f"[worker {index}] ", **options)
+            finally:
+                connector.disconnect()
+    except Exception as e:
+        stats = {"error": f"{type(e).__name__}: {e}"}
+        print(f"[worker {index}] ❌ {stats['error']}")
+    finally:
+        results.put((index, stats))
+
+
+def _collect_stats(procs, results, poll=1.0):
+    """Gather one report per worker; a worker that exits without reporting counts as failed."""
+    stats = {}
+    pending = set(range(len(procs)))
+    while pending:
+        try:
+            index, st = results.get(timeout=poll)
+            stats[index] = st
+            pending.discard(index)
+        except queue.Empty:
+            dead = [i for i in pending if procs[i].exitcode is not None]
+            # A worker that reported just before exiting is still in the pipe
+            try:
+                while True:
+                    index, st = results.get(timeout=0.2)
+                    stats[index] = st
+                    pending.discard(index)
+            except queue.Empty:
+                pass
+            for i in dead:
+                if i in pending:
+                    stats[i] = {"error": f"worker exited with code {procs[i].exitcode} without reporting"}
+                    pending.discard(i)
+                    print(f"[worker {i}] ❌ {stats[i]['error']}")
+        except KeyboardInterrupt:
+            # Workers handle Ctrl+C themselves and still report their stats
+            continue
+    return [stats[i] for i in range(len(procs))]
+
+
+def run_workers(workers, rate=1000.0, total=None, **options):
+    """Run `workers` batch loops in parallel processes and aggregate their stats.
+
+    Ids come from the shared sequence and duplicate (race, driver) pairs are
+    resolved by ON CONFLICT, so workers need no coordination beyond the
+    database itself. The target rate and row total are split evenly across
+    workers. Workers that raise or die are reported as failed.
+    """
+    connector = F1DatabaseConnector(quiet=True)
+    if not connector.connect():
+        print("Failed to connect to database")
+        return None
+    try:
+        # Run the one-off setup once, before workers race to do it
+        ensure_id_sequence(connector)
+        ensure_unique_rule(connector)
+    finally:
+        connector.disconnect()
+
+    results = multiprocessing.Queue()
+    procs = []
+    start = time.perf_counter()
+    for i in range(workers):
+        share = None if total is None else total // workers + (1 if i < total % workers else 0)
+        worker_options = dict(options, rate=rate / workers if rate else 0, total=share)
+        proc = multiprocessing.Process(target=_batch_worker, args=(i, worker_options, results))
+        proc.start()
+        procs.append(proc)
+
+    stats = _collect_stats(procs, results)
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    failed = [i for i, st in enumerate(stats) if "error" in st]
+    finished = [st for st in stats if "error" not in st]
+    inserted = sum(st["inserted"] for st in finished)
+    attempted = sum(st["attempted"] for st in finished)
+    conflicts = attempted - inserted
+    print("=" * 60)
+    print(f"{len(finished)}/{workers} workers finished: {inserted} rows in {elapsed:.1f}s "
+          f"({inserted / elapsed if elapsed else 0:,.0f} rows/s aggregate)")
+    if failed:
+        print(f"❌ {len(failed)} workers failed: " +
+              "; ".join(f"worker {i}: {stats[i]['error']}" for i in failed))
+    print(f"Conflicts: {conflicts} ({conflicts / attempted if attempted else 0:.2%} of attempted rows)")
+    return {"inserted": inserted, "attempted": attempted, "seconds": elapsed, "failed": len(failed)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Insert synthetic F1 race results")
+    parser.add_argument("--batch", action="store_true",
+                        help="high-rate load generation instead of one row every 10 seconds")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="target rows per second in batch mode, 0 for unthrottled (default: 1000)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per INSERT/COPY (default: 500)")
+    parser.add_argument("--commit-every", type=int, default=1, help="batches per commit (default: 1)")
+    parser.add_argument("--method", choices=("values", "copy"), default="values",
+                        help="execute_values INSERT or COPY FROM STDIN (default: values)")
+    parser.add_argument("--total", type=int, default=None, help="stop after this many rows")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--min-year", type=int, default=2020,
+                        help="only generate results for races from this season on (default: 2020)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of parallel writer processes in batch mode (default: 1)")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    if args.batch and args.workers > 1:
+        run_workers(args.workers, rate=args.rate, total=args.total, batch_size=args.batch_size,
+                    commit_every=max(1, args.commit_every), method=args.method,
+                    duration=args.duration, min_year=args.min_year)
+        return
+    if args.batch:
+        connector = F1DatabaseConnector(quiet=True)
+        if not connector.connect():
+            print("Failed to connect to database")
+            return
+        try:
+            run_batch_mode(connector, rate=args.rate, batch_size=args.batch_size,
+                           commit_every=max(1, args.commit_every), method=args.method,
+                           total=args.total, duration=args.duration, min_year=args.min_year)
+        finally:
+            connector.disconnect()
+        return
+
     print("🏎️  F1 Auto-Insert Script Started")
     print("=" * 60)
     print("Inserting new race results every 10 seconds...")
@@ -135,9 +518,11 @@ def main():
         return
     
     try:
+        ensure_id_sequence(connector)
+        conflict_target = ensure_unique_rule(connector)
         count = 0
         while True:
-            success = insert_new_result(connector)
+            success = insert_new_result(connector, conflict_target)
             if success:
                 count += 1
                 print(f"📊 Total inserted: {count} | {datetime.now().strftime('%H:%M:%S')}\n")
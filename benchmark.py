@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""Benchmark the reporting pipeline on a synthetic F1 dataset.
+
+Generates a schema-compatible dataset at a chosen scale (1x is roughly the
+Kaggle volume: ~22k results, ~585k lap_times, ~8k pit_stops) into its own
+schema of the `.env` database, then times every `queries.sql` statement, the
+`main.py` export paths and the CSV loader, and writes a JSON report that can
+be compared against a stored baseline.
+
+    py benchmark.py --scale 10 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: memory is not reported
+    resource = None
+
+import main as report
+from columnar_export import pa
+from connection import F1DatabaseConnector
+from load_csv_to_db import load_csv_to_db
+
+BENCH_DIR = os.path.join(os.path.dirname(__file__), "benchmarks")
+DEFAULT_SCHEMA = "f1_bench"
+EXPORT_QUERY = "SELECT * FROM lap_times;"
+
+# Base (1x) volumes, close to the Kaggle dataset
+RACES_PER_SEASON = 15
+FIRST_SEASON, LAST_SEASON = 1950, 2024
+DRIVERS_PER_RACE = 20
+LAPS_PER_RESULT = 26
+N_DRIVERS, N_CONSTRUCTORS, N_CIRCUITS, N_STATUS = 860, 211, 77, 139
+COUNTRIES = "ARRAY['Italy','UK','Germany','France','Spain','Brazil','USA','Japan','Australia','Monaco']"
+
+GENERATE_SQL = f"""
+CREATE TABLE bench_meta AS SELECT {{scale}}::int AS scale, now() AS generated_at;
+
+CREATE TABLE status AS
+SELECT g AS statusid, CASE WHEN g = 1 THEN 'Finished' ELSE 'Status ' || g END AS status
+FROM generate_series(1, {N_STATUS}) g;
+
+CREATE TABLE circuits AS
+SELECT g AS circuitid, 'Circuit ' || g AS name, 'Location ' || g AS location,
+       ({COUNTRIES})[1 + g % 10] AS country,
+       (-60 + (g * 37) % 120)::double precision AS lat,
+       (-180 + (g * 53) % 360)::double precision AS lng
+FROM generate_series(1, {N_CIRCUITS}) g;
+
+CREATE TABLE drivers AS
+SELECT g AS driverid, 'Forename' || g AS forename, 'Surname' || g AS surname,
+       ({COUNTRIES})[1 + (g * 3) % 10] AS nationality,
+       DATE '1920-01-01' + g * 31 AS dob
+FROM generate_series(1, {N_DRIVERS}) g;
+
+CREATE TABLE constructors AS
+SELECT g AS constructorid, 'Constructor ' || g AS name, ({COUNTRIES})[1 + g % 10] AS nationality
+FROM generate_series(1, {N_CONSTRUCTORS}) g;
+
+CREATE TABLE races AS
+SELECT g AS raceid, {FIRST_SEASON} + (g - 1) / per_season AS year,
+       (g - 1) % per_season + 1 AS round, 1 + g % {N_CIRCUITS} AS circuitid,
+       'Grand Prix ' || ((g - 1) % per_season + 1) AS name,
+       make_date({FIRST_SEASON} + (g - 1) / per_season, 1, 1) + ((g - 1) % per_season) * 300 / per_season AS date
+FROM (SELECT {RACES_PER_SEASON} * {{scale}} AS per_season) p,
+     generate_series(1, {RACES_PER_SEASON} * {{scale}} * ({LAST_SEASON} - {FIRST_SEASON} + 1)) g;
+
+CREATE TABLE results AS
+SELECT (ra.raceid - 1) * {DRIVERS_PER_RACE} + k + 1 AS resultid, ra.raceid,
+       1 + (ra.raceid * 7 + k * 13) % {N_DRIVERS} AS driverid,
+       1 + (ra.raceid + k / 2) % {N_CONSTRUCTORS} AS constructorid,
+       k + 1 AS number, 1 + (k * 7 + ra.raceid) % {DRIVERS_PER_RACE} AS grid,
+       CASE WHEN dnf THEN NULL ELSE k + 1 END AS position,
+       CASE WHEN dnf THEN 'R' ELSE (k + 1)::text END AS positiontext,
+       k + 1 AS positionorder,
+       CASE WHEN NOT dnf AND k < 10 THEN (ARRAY[25,18,15,12,10,8,6,4,2,1])[k + 1] ELSE 0 END::double precision AS points,
+       50 + k % 20 AS laps, NULL::text AS time,
+       5400000 + k * 1000 + ra.raceid % 1000 AS milliseconds,
+       CASE WHEN ra.year >= 2004 THEN 40 + k END AS fastestlap,
+       CASE WHEN ra.year >= 2004 THEN k + 1 END AS rank,
+       CASE WHEN ra.year >= 2004 THEN '1:3' || (k % 10) || '.000' END AS fastestlaptime,
+       CASE WHEN ra.year >= 2004 THEN 180 + (k * 13 + ra.raceid) % 60 + 0.5 END AS fastestlapspeed,
+       CASE WHEN dnf THEN 2 + (ra.raceid + k) % ({N_STATUS} - 1) ELSE 1 END AS statusid
+FROM races ra
+CROSS JOIN generate_series(0, {DRIVERS_PER_RACE - 1}) k
+CROSS JOIN LATERAL (SELECT (ra.raceid * 31 + k * 17) % 10 < 2 AS dnf) d;
+
+CREATE TABLE qualifying AS
+SELECT row_number() OVER () AS qualifyid, r.raceid, r.driverid, r.constructorid, r.number,
+       1 + ((r.positionorder - 1) * 3 + r.raceid) % {DRIVERS_PER_RACE} AS position
+FROM results r JOIN races ra ON ra.raceid = r.raceid
+WHERE ra.year >= 1994;
+
+CREATE TABLE pit_stops AS
+SELECT r.raceid, r.driverid, s AS stop, 15 * s + r.positionorder AS lap,
+       '14:0' || s || ':00' AS time, '2' || s || '.500' AS duration,
+       20000 + (r.raceid * r.positionorder * s) % 10000 AS milliseconds
+FROM results r JOIN races ra ON ra.raceid = r.raceid
+CROSS JOIN generate_series(1, 2) s
+WHERE ra.year >= 2011;
+
+CREATE TABLE lap_times AS
+SELECT r.raceid, r.driverid, l AS lap, r.positionorder AS position,
+       '1:3' || (l % 10) || '.' || lpad((r.resultid % 1000)::text, 3, '0') AS time,
+       90000 + (r.resultid * l) % 5000 AS milliseconds
+FROM results r CROSS JOIN generate_series(1, {LAPS_PER_RESULT}) l;
+
+ALTER TABLE status ADD PRIMARY KEY (statusid);
+ALTER TABLE circuits ADD PRIMARY KEY (circuitid);
+ALTER TABLE drivers ADD PRIMARY KEY (driverid);
+ALTER TABLE constructors ADD PRIMARY KEY (constructorid);
+ALTER TABLE races ADD PRIMARY KEY (raceid);
+ALTER TABLE results ADD PRIMARY KEY (resultid);
+ALTER TABLE qualifying ADD PRIMARY KEY (qualifyid);
+ALTER TABLE pit_stops ADD PRIMARY KEY (raceid, driverid, stop);
+ALTER TABLE lap_times ADD PRIMARY KEY (raceid, driverid, lap);
+ANALYZE;
+"""
+
+DATASET_TABLES = ["circuits", "races", "drivers", "constructors", "status",
+                  "results", "qualifying", "pit_stops", "lap_times"]
+
+
+def generate_dataset(conn, schema, scale, regenerate=False):
+    """Create the synthetic dataset in `schema` unless it already exists at `scale`."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", (f"{schema}.bench_meta",))
+        if cur.fetchone()[0] and not regenerate:
+            cur.execute(f"SELECT scale FROM {schema}.bench_meta")
+            if cur.fetchone()[0] == scale:
+                print(f"Reusing {scale}x dataset in schema {schema}")
+                conn.commit()
+                return False
+        print(f"Generating {scale}x dataset in schema {schema}...")
+        start = time.perf_counter()
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET LOCAL search_path TO {schema}")
+        # No query parameters: the script is full of literal `%` (modulo) operators
+        cur.execute(GENERATE_SQL.replace("{scale}", str(int(scale))))
+    conn.commit()
+    print(f"Dataset generated in {time.perf_counter() - start:.1f}s")
+    return True
+
+
+def table_sizes(conn):
+    with conn.cursor() as cur:
+        sizes = {}
+        for table in DATASET_TABLES:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            sizes[table] = cur.fetchone()[0]
+    conn.commit()
+    return sizes
+
+
+def _rss_mb():
+    """Peak resident set size of this process since the last reset, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def _reset_peak_rss():
+    """Restart the peak-RSS window at the current RSS (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def _measure(fn, repeats):
+    """Median wall time of `fn()` over `repeats` runs, plus its peak RSS growth (MB).
+
+    Timing runs are untraced. Memory comes from one extra run measured by
+    process RSS, so libpq's result buffers count too. On Linux the peak is
+    reset before that run; elsewhere only growth beyond the earlier process
+    peak is visible, so `peak_mb` can read low.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if resource is not None:
+        gc.collect()
+        _reset_peak_rss()
+        before = _rss_mb()
+        fn()
+        peak = round(max(0.0, _rss_mb() - before), 2)
+    return {"seconds": statistics.median(times), "peak_mb": peak}
+
+
+def bench_queries(conn, statements, repeats):
+    results = {}
+    for i, sql in enumerate(statements, start=1):
+        def run(sql=sql):
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.fetchall()
+            conn.commit()
+        results[f"query:q{i}"] = _measure(run, repeats)
+        print(f"  q{i}: {results[f'query:q{i}']['seconds'] * 1000:.1f} ms")
+    return results
+
+
+def bench_exports(conn, out_dir, repeats):
+    """Time every export path of main.py on the full lap_times table."""
+    report.OUTPUTS_DIR = out_dir
+    variants = [(mode, "csv") for mode in report.EXPORT_MODES]
+    if pa is not None:
+        variants += [("stream", "parquet"), ("stream", "feather")]
+    results = {}
+    for mode, fmt in variants:
+        def run(mode=mode, fmt=fmt):
+            report.export_statement(conn, 1, EXPORT_QUERY, mode, fmt)
+            conn.commit()
+        key = f"export:{mode}:{fmt}"
+        results[key] = _measure(run, repeats)
+        results[key]["bytes"] = os.path.getsize(report.output_path(1, fmt))
+        print(f"  {mode}/{fmt}: {results[key]['seconds']:.2f}s, "
+              f"peak {results[key]['peak_mb']} MB, {results[key]['bytes'] / 2**20:.1f} MB on disk")
+    return results
+
+
+def bench_loader(conn, out_dir):
+    """Export lap_times with COPY, then time loading it back with load_csv_to_db."""
+    report.OUTPUTS_DIR = out_dir
+    report.export_statement(conn, 1, EXPORT_QUERY, "copy")
+    conn.commit()
+    csv_path = report.output_path(1)
+    result = _measure(lambda: load_csv_to_db(csv_path, "bench_lap_times_load"), 1)
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS bench_lap_times_load")
+    conn.commit()
+    return {"load:csv": result}
+
+
+def compare(report_data, baseline, threshold):
+    """Print per-metric change against a baseline; return the regressed keys."""
+    regressions = []
+    print(f"\n{'Metric':<28}{'Baseline':>12}{'Current':>12}{'Change':>10}")
+    for key, current in report_data["timings"].items():
+        base = baseline.get("timings", {}).get(key)
+        if not base or not base["seconds"]:
+            continue
+        change = current["seconds"] / base["seconds"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{key:<28}{base['seconds']:>12.3f}{current['seconds']:>12.3f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(key)
+    if baseline.get("scale") != report_data["scale"]:
+        print(f"Note: baseline was taken at {baseline.get('scale')}x, this run is {report_data['scale']}x")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark queries, exports and loader on synthetic F1 data")
+    parser.add_argument("--scale", type=int, default=1, help="dataset scale factor, e.g. 1, 10, 100 (default: 1)")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help=f"schema for the dataset (default: {DEFAULT_SCHEMA})")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the dataset even if it exists")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per measurement, median reported (default: 3)")
+    parser.add_argument("--skip-exports", action="store_true", help="only time the queries")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "latest.json"), help="report path")
+    parser.add_argument("--baseline", default=None, help="baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown fraction reported as a regression (default: 0.2)")
+    parser.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.schema.lower() == "public":
+        print("Refusing to generate the benchmark dataset into the public schema")
+        return 1
+    # libpq applies PGOPTIONS to every connection this process opens, so the
+    # report and loader code run against the benchmark schema unchanged
+    os.environ["PGOPTIONS"] = f"-c search_path={args.schema}"
+
+    connector = F1DatabaseConnector(quiet=True)
+    if not connector.connect():
+        print("Failed to connect. Please check your .env settings.")
+        return 1
+    conn = connector.connection
+    try:
+        generate_dataset(conn, args.schema, args.scale, args.regenerate)
+        sizes = table_sizes(conn)
+        print("Rows: " + ", ".join(f"{t}={n}" for t, n in sizes.items()))
+
+        timings = {}
+        print("\nQueries:")
+        timings.update(bench_queries(conn, report.load_queries(report.QUERIES_FILE), args.repeats))
+        if not args.skip_exports:
+            with tempfile.TemporaryDirectory() as tmp:
+                print("\nExports (lap_times):")
+                timings.update(bench_exports(conn, tmp, args.repeats))
+                print("\nLoader:")
+                timings.update(bench_loader(conn, tmp))
+    finally:
+        connector.disconnect()
+
+    report_data = {
+        "scale": args.scale,
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "rows": sizes,
+        "timings": timings,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report_data, fh, indent=2)
+    print(f"\nReport written to {args.output}")
+    if args.save_baseline:
+        path = args.baseline or os.path.join(BENCH_DIR, "baseline.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report_data, fh, indent=2)
+        print(f"Baseline saved to {path}")
+    elif args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare(report_data, json.load(fh), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,65 +1,253 @@
 #!/usr/bin/env python3
-"""Check F1 database structure and sample data."""
+"""Check F1 database structure, sizes and indexing, and show sample data.
+
+Row counts are planner estimates from `pg_class.reltuples` (no table scans).
+The index check looks for the join/filter columns used by `queries.sql` and
+`superset_queries.sql`; `--create-indexes` builds the missing ones
+CONCURRENTLY and re-times both query files before and after.
+"""
+
+import argparse
+import os
+import statistics
+import time
 
 from connection import F1DatabaseConnector
+from main import QUERIES_FILE, is_query, load_queries
+
+SUPERSET_QUERIES_FILE = os.path.join(os.path.dirname(__file__), "superset_queries.sql")
+
+# (table, columns) the report queries join or filter on
+RECOMMENDED_INDEXES = [
+    ("results", ("raceid",)),
+    ("results", ("driverid",)),
+    ("results", ("constructorid",)),
+    ("races", ("year",)),
+    ("qualifying", ("raceid", "driverid")),
+]
+
+DEAD_TUPLE_WARN = 0.2
+
+
+def table_overview(cur, schema="public"):
+    """Estimated rows, sizes and dead-tuple ratio for every table in `schema`."""
+    cur.execute("""
+        SELECT c.relname,
+               c.reltuples::bigint,
+               s.n_live_tup,
+               s.n_dead_tup,
+               pg_relation_size(c.oid),
+               pg_indexes_size(c.oid),
+               pg_total_relation_size(c.oid),
+               s.seq_scan,
+               s.idx_scan
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
+        ORDER BY pg_total_relation_size(c.oid) DESC
+    """, (schema,))
+    tables = []
+    for name, reltuples, live, dead, heap, indexes, total, seq_scan, idx_scan in cur.fetchall():
+        # reltuples is -1 until the first VACUUM/ANALYZE; fall back to the stats counter
+        rows = reltuples if reltuples >= 0 else live
+        dead_ratio = dead / (live + dead) if live is not None and dead and live + dead else 0.0
+        tables.append({
+            "table": name, "rows": rows, "analyzed": reltuples >= 0, "dead_ratio": dead_ratio,
+            "heap_bytes": heap, "index_bytes": indexes, "total_bytes": total,
+            "seq_scan": seq_scan, "idx_scan": idx_scan,
+        })
+    return tables
+
+
+def existing_indexes(cur, schema="public"):
+    """{table: [column tuples]} for every valid index in `schema`."""
+    cur.execute("""
+        SELECT t.relname, array_agg(a.attname ORDER BY k.ord)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+        WHERE n.nspname = %s AND i.indisvalid
+        GROUP BY i.indexrelid, t.relname
+    """, (schema,))
+    indexes = {}
+    for table, columns in cur.fetchall():
+        indexes.setdefault(table, []).append(tuple(columns))
+    return indexes
+
+
+def missing_indexes(cur, schema="public"):
+    """Recommended (table, columns) with no index whose leading columns match."""
+    cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s", (schema,))
+    present = {row[0] for row in cur.fetchall()}
+    indexes = existing_indexes(cur, schema)
+    missing = []
+    for table, columns in RECOMMENDED_INDEXES:
+        if table not in present:
+            continue
+        if not any(idx[:len(columns)] == columns for idx in indexes.get(table, [])):
+            missing.append((table, columns))
+    return missing
+
+
+def index_name(table, columns):
+    return f"{table}_{'_'.join(columns)}_idx"
+
+
+def create_indexes(conn, missing):
+    """Build `missing` indexes CONCURRENTLY (no write lock) and re-ANALYZE their tables."""
+    previous = conn.autocommit
+    conn.rollback()
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for table, columns in missing:
+                name = index_name(table, columns)
+                start = time.perf_counter()
+                try:
+                    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                                f"ON {table} ({', '.join(columns)})")
+                except Exception as e:
+                    # A failed concurrent build leaves an INVALID index behind
+                    print(f"  {name}: failed ({str(e).strip()})")
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                    continue
+                print(f"  {name}: created in {time.perf_counter() - start:.2f}s")
+            for table in sorted({table for table, _ in missing}):
+                cur.execute(f"ANALYZE {table}")
+    finally:
+        conn.autocommit = previous
+
 
-def check_database():
+def time_queries(conn, statements, repeats=3):
+    """Median seconds per row-returning statement (index in the file -> seconds)."""
+    timings = {}
+    with conn.cursor() as cur:
+        for i, sql in enumerate(statements, start=1):
+            if not is_query(sql):
+                continue
+            runs = []
+            try:
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    cur.execute(sql)
+                    cur.fetchall()
+                    runs.append(time.perf_counter() - start)
+            except Exception as e:
+                print(f"  q{i} failed: {str(e).strip()}")
+                conn.rollback()
+                continue
+            timings[i] = statistics.median(runs)
+    conn.rollback()
+    return timings
+
+
+def print_overview(tables):
+    def mb(value):
+        return f"{value / 2**20:.1f}"
+
+    print("📋 F1 Database Tables:")
+    print("=" * 92)
+    print(f"  {'Table':<26}{'~Rows':>11}{'Heap MB':>10}{'Index MB':>10}{'Total MB':>10}"
+          f"{'Dead %':>8}{'Seq scans':>11}")
+    for t in tables:
+        rows = f"{t['rows']:d}" if t["rows"] is not None else "?"
+        if not t["analyzed"]:
+            rows += "*"
+        print(f"  {t['table']:<26}{rows:>11}{mb(t['heap_bytes']):>10}{mb(t['index_bytes']):>10}"
+              f"{mb(t['total_bytes']):>10}{t['dead_ratio'] * 100:>7.1f}%{t['seq_scan'] or 0:>11d}")
+    if any(not t["analyzed"] for t in tables):
+        print("  * never analyzed; estimate from pg_stat_user_tables")
+    bloated = [t["table"] for t in tables if t["dead_ratio"] > DEAD_TUPLE_WARN]
+    if bloated:
+        print(f"  ⚠️ Over {DEAD_TUPLE_WARN:.0%} dead tuples, consider VACUUM: {', '.join(bloated)}")
+    print("=" * 92)
+
+
+def print_timings(label, before, after):
+    print(f"\n⏱️ {label}:")
+    for i, seconds in before.items():
+        new = after.get(i)
+        change = f"{new * 1000:9.1f} ms  ({seconds / new:.1f}x)" if new else "        -"
+        print(f"  q{i:<4}{seconds * 1000:9.1f} ms -> {change}")
+
+
+def print_samples(cur):
+    print("\n📊 Sample Data - Recent Races:")
+    cur.execute("""
+        SELECT r.year, r.round, r.name, c.name as circuit
+        FROM races r
+        JOIN circuits c ON c.circuitid = r.circuitid
+        WHERE r.year >= 2020
+        ORDER BY r.year DESC, r.round DESC
+        LIMIT 5
+    """)
+    for row in cur.fetchall():
+        print(f"  {row[0]} Round {row[1]:2d}: {row[2]:30s} ({row[3]})")
+
+    print("\n📊 Sample Data - Top Drivers by Points:")
+    cur.execute("""
+        SELECT d.forename || ' ' || d.surname AS driver,
+               SUM(r.points) AS total_points
+        FROM results r
+        JOIN drivers d ON d.driverid = r.driverid
+        GROUP BY d.driverid, driver
+        ORDER BY total_points DESC
+        LIMIT 5
+    """)
+    for row in cur.fetchall():
+        print(f"  {row[0]:30s} - {row[1]:6.0f} points")
+
+
+def check_database(create=False, repeats=3, samples=True):
     connector = F1DatabaseConnector()
     if not connector.connect():
         return
-    
+
     try:
-        cur = connector.connection.cursor()
-        
-        # List all tables
-        cur.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            ORDER BY table_name
-        """)
-        tables = cur.fetchall()
-        
-        print("📋 F1 Database Tables:")
-        print("=" * 60)
-        for table in tables:
-            table_name = table[0]
-            cur.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cur.fetchone()[0]
-            print(f"  {table_name:30s} - {count:6d} rows")
-        
-        print("\n" + "=" * 60)
-        
-        # Sample data from key tables
-        print("\n📊 Sample Data - Recent Races:")
-        cur.execute("""
-            SELECT r.year, r.round, r.name, c.name as circuit
-            FROM races r
-            JOIN circuits c ON c.circuitid = r.circuitid
-            WHERE r.year >= 2020
-            ORDER BY r.year DESC, r.round DESC
-            LIMIT 5
-        """)
-        for row in cur.fetchall():
-            print(f"  {row[0]} Round {row[1]:2d}: {row[2]:30s} ({row[3]})")
-        
-        print("\n📊 Sample Data - Top Drivers by Points:")
-        cur.execute("""
-            SELECT d.forename || ' ' || d.surname AS driver, 
-                   SUM(r.points) AS total_points
-            FROM results r
-            JOIN drivers d ON d.driverid = r.driverid
-            GROUP BY d.driverid, driver
-            ORDER BY total_points DESC
-            LIMIT 5
-        """)
-        for row in cur.fetchall():
-            print(f"  {row[0]:30s} - {row[1]:6.0f} points")
-        
-        cur.close()
-        
+        conn = connector.connection
+        with conn.cursor() as cur:
+            print_overview(table_overview(cur))
+            missing = missing_indexes(cur)
+
+        if missing:
+            print("\n🔎 Missing indexes for report queries:")
+            for table, columns in missing:
+                print(f"  CREATE INDEX CONCURRENTLY {index_name(table, columns)} "
+                      f"ON {table} ({', '.join(columns)});")
+        else:
+            print("\n✅ All recommended indexes are present")
+
+        if create and missing:
+            files = {"queries.sql": QUERIES_FILE, "superset_queries.sql": SUPERSET_QUERIES_FILE}
+            statements = {label: load_queries(path) for label, path in files.items()}
+            before = {label: time_queries(conn, stmts, repeats) for label, stmts in statements.items()}
+            print("\n🛠️ Creating indexes:")
+            create_indexes(conn, missing)
+            for label, stmts in statements.items():
+                print_timings(label, before[label], time_queries(conn, stmts, repeats))
+
+        if samples:
+            with conn.cursor() as cur:
+                print_samples(cur)
+            conn.rollback()
+
     finally:
         connector.disconnect()
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check F1 database sizes, indexes and sample data")
+    parser.add_argument("--create-indexes", action="store_true",
+                        help="create the missing recommended indexes and re-time the report queries")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per query when timing (median is reported)")
+    parser.add_argument("--no-samples", action="store_true", help="skip the sample data queries")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    check_database()
+    args = parse_args()
+    check_database(create=args.create_indexes, repeats=args.repeats, samples=not args.no_samples)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Parquet / Arrow IPC (Feather v2) writers and readers for query results.
+
+Column types come from the PostgreSQL type OIDs in `cursor.description`, so
+downstream readers get typed columns instead of re-parsing text. NUMERIC is
+kept exact as an Arrow decimal rather than rounded through float64.
+"""
+
+import os
+from decimal import Decimal
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for --format parquet/feather
+    pa = None
+
+FORMAT_EXTENSIONS = {"csv": "csv", "parquet": "parquet", "feather": "arrow"}
+ROW_GROUP_ROWS = 50000
+COMPRESSION = "zstd"
+
+# PostgreSQL type OID -> Arrow type factory
+_OID_TYPES = {
+    16: "bool_",
+    20: "int64", 21: "int16", 23: "int32", 26: "int64",
+    700: "float32", 701: "float64",
+    1082: "date32",
+    1114: "timestamp_us", 1184: "timestamp_us_tz",
+    1083: "time64_us",
+}
+NUMERIC_OID = 1700
+MAX_DECIMAL_PRECISION = 38  # decimal128
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet/Arrow export needs pyarrow. Install with: pip install -r requirements.txt")
+
+
+def _arrow_type(type_code):
+    name = _OID_TYPES.get(type_code)
+    if name == "timestamp_us":
+        return pa.timestamp("us")
+    if name == "timestamp_us_tz":
+        return pa.timestamp("us", tz="UTC")
+    if name == "time64_us":
+        return pa.time64("us")
+    if name:
+        return getattr(pa, name)()
+    return pa.string()
+
+
+def _sample_scale(values):
+    """Largest number of fractional digits among the finite Decimals in `values`, or None."""
+    scales = [max(0, -v.as_tuple().exponent) for v in values
+              if isinstance(v, Decimal) and v.is_finite()]
+    if len(scales) < sum(v is not None for v in values):
+        return None  # NaN / Infinity have no decimal representation
+    return max(scales, default=None)
+
+
+def _numeric_type(col, sample):
+    """decimal128 for a NUMERIC column, from its typmod or else from the sampled values."""
+    precision, scale = col.precision, col.scale
+    if precision is None or precision > MAX_DECIMAL_PRECISION:
+        # Unconstrained NUMERIC (e.g. SUM/ROUND results): size the scale from the
+        # first batch; write_columnar widens it if a later batch needs more digits
+        scale = _sample_scale(sample)
+        if scale is None or scale > MAX_DECIMAL_PRECISION:
+            return pa.string()
+        precision = MAX_DECIMAL_PRECISION
+    return pa.decimal128(precision, scale)
+
+
+def arrow_schema(description, sample=()):
+    """Arrow schema for a psycopg2 `cursor.description`.
+
+    `sample` (the first fetched rows) sizes NUMERIC columns declared without a
+    precision; without usable values they fall back to exact strings.
+    """
+    require_pyarrow()
+    fields = []
+    for i, col in enumerate(description):
+        if col.type_code == NUMERIC_OID:
+            arrow_type = _numeric_type(col, [row[i] for row in sample])
+        else:
+            arrow_type = _arrow_type(col.type_code)
+        fields.append(pa.field(col.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _column(values, arrow_type):
+    if pa.types.is_floating(arrow_type):
+        # Arrow will not cast a stray Decimal to float implicitly
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    elif pa.types.is_string(arrow_type):
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    return pa.array(values, type=arrow_type)
+
+
+def _widen(arrow_type, values):
+    """Type that holds both `arrow_type` decimals and `values`, or None if it already does."""
+    if not pa.types.is_decimal(arrow_type):
+        return None
+    scale = arrow_type.scale
+    whole = arrow_type.precision - arrow_type.scale
+    for v in values:
+        if v is None:
+            continue
+        if not isinstance(v, Decimal) or not v.is_finite():
+            return pa.string()  # NaN / Infinity have no decimal representation
+        sign, digits, exponent = v.as_tuple()
+        scale = max(scale, -exponent)
+        whole = max(whole, len(digits) + exponent)
+    if scale + whole > MAX_DECIMAL_PRECISION:
+        return pa.string()
+    if (scale + whole, scale) == (arrow_type.precision, arrow_type.scale):
+        return None
+    return pa.decimal128(scale + whole, scale)
+
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    arrays = [_column(list(col), field.type) for col, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _copy_cast(path, writer, schema):
+    """Write every batch of the file at `path` to `writer`, cast to `schema`."""
+    _, batches = open_batches(path)
+    for old in batches:
+        writer.write(pa.RecordBatch.from_arrays(
+            [col.cast(field.type) for col, field in zip(old.columns, schema)], schema=schema))
+
+
+class _Writer:
+    """Parquet or Arrow IPC file writer with one `write(record_batch)` interface."""
+
+    def __init__(self, path, fmt, schema, compression):
+        self.path = path
+        self.sink = None
+        if fmt == "parquet":
+            self.writer = pq.ParquetWriter(path, schema, compression=compression)
+        elif fmt == "feather":
+            self.sink = pa.OSFile(path, "wb")
+            self.writer = pa_ipc.new_file(self.sink, schema,
+                                          options=pa_ipc.IpcWriteOptions(compression=compression))
+        else:
+            raise ValueError(f"Unknown columnar format {fmt!r}")
+
+    def write(self, record_batch):
+        self.writer.write_batch(record_batch)
+
+    def close(self):
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+
+
+def write_columnar(cur, out, fmt, batch_rows=ROW_GROUP_ROWS, compression=COMPRESSION):
+    """Stream the pending result set of `cur` into a Parquet or Feather file.
+
+    Each fetched batch becomes one Parquet row group / IPC record batch, so
+    memory stays bounded by `batch_rows`. If a batch holds NUMERIC values the
+    schema's decimal type cannot represent, the column is widened (or turned
+    into exact strings) and the batches written so far are rewritten with the
+    new schema. Returns the row count.
+    """
+    require_pyarrow()
+    batch = cur.fetchmany(batch_rows)
+    schema = arrow_schema(cur.description, batch)
+    writer = _Writer(out, fmt, schema, compression)
+    base, ext = os.path.splitext(out)
+    rewrites = 0
+    rows = 0
+    try:
+        while batch:
+            widened = [_widen(field.type, [row[i] for row in batch]) for i, field in enumerate(schema)]
+            if any(widened):
+                schema = pa.schema([pa.field(field.name, new) if new else field
+                                    for field, new in zip(schema, widened)])
+                writer.close()
+                rewrites += 1
+                previous = writer.path
+                writer = _Writer(f"{base}.widen{rewrites}{ext}", fmt, schema, compression)
+                _copy_cast(previous, writer, schema)
+                if previous != out:
+                    os.remove(previous)
+            writer.write(_record_batch(batch, schema))
+            rows += len(batch)
+            batch = cur.fetchmany(batch_rows)
+    finally:
+        writer.close()
+    if writer.path != out:
+        os.replace(writer.path, out)
+    return rows
+
+
+def open_batches(path):
+    """Return (schema, iterator of RecordBatch) for a Parquet or Arrow IPC file."""
+    require_pyarrow()
+    if path.endswith(".parquet"):
+        pf = pq.ParquetFile(path)
+        return pf.schema_arrow, pf.iter_batches()
+    reader = pa_ipc.open_file(pa.memory_map(path, "r"))
+    return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+
+def pg_type(arrow_type):
+    """PostgreSQL column type for an Arrow type."""
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "BIGINT" if arrow_type.bit_width > 32 else "INTEGER"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE PRECISION"
+    if pa.types.is_decimal(arrow_type):
+        return f"NUMERIC({arrow_type.precision}, {arrow_type.scale})"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMPTZ" if arrow_type.tz else "TIMESTAMP"
+    if pa.types.is_time(arrow_type):
+        return "TIME"
+    return "TEXT"
+
+
+def batch_to_csv(batch):
+    """Render a record batch as headerless CSV bytes for COPY FROM STDIN."""
+    buf = pa.BufferOutputStream()
+    pa_csv.write_csv(batch, buf, write_options=pa_csv.WriteOptions(include_header=False))
+    return buf.getvalue().to_pybytes()
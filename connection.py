@@ -4,52 +4,296 @@
 import psycopg2
 from psycopg2 import Error
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
-class F1DatabaseConnector:
-    def __init__(self):
-        """Load DB settings from `.env`."""
+_env_loaded = False
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def load_settings():
+    """Return DB settings from `.env`, reading the file only once per process."""
+    global _env_loaded
+    if not _env_loaded:
         load_dotenv()
-        self.host = os.getenv('DB_HOST')
-        self.database = os.getenv('DB_NAME')
-        self.user = os.getenv('DB_USER')
-        self.password = os.getenv('DB_PASSWORD')
-        self.port = os.getenv('DB_PORT')
-        self.connection = None
-        
+        _env_loaded = True
+    return {
+        'host': os.getenv('DB_HOST'),
+        'database': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'port': os.getenv('DB_PORT'),
+    }
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are health-checked on checkout when they have been idle for
+    longer than `check_after` seconds, and connections above `minconn` that
+    stay idle for `idle_timeout` seconds are closed. `getconn` blocks (up to
+    `timeout`) when all `maxconn` connections are in use instead of failing.
+    """
+
+    def __init__(self, settings, minconn=1, maxconn=10, idle_timeout=300.0,
+                 check_after=30.0, lazy=False):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool size must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self.settings = dict(settings)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self._idle = []  # (connection, returned_at) pairs, most recent last
+        self._in_use = set()
+        self._size = 0  # open connections, including ones still being opened
+        self._cond = threading.Condition()
+        self.closed = False
+        if not lazy:
+            for _ in range(minconn):
+                self._idle.append((self._new_connection(), time.monotonic()))
+                self._size += 1
+
+    def _new_connection(self):
+        return psycopg2.connect(**self.settings)
+
+    @staticmethod
+    def _is_healthy(conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Error:
+            return False
+
+    def _evict_idle(self):
+        """Close connections idle longer than `idle_timeout`, keeping `minconn` open."""
+        now = time.monotonic()
+        keep = []
+        for conn, returned_at in self._idle:
+            if self._size > self.minconn and now - returned_at > self.idle_timeout:
+                conn.close()
+                self._size -= 1
+            else:
+                keep.append((conn, returned_at))
+        self._idle = keep
+
+    def _reserve(self, deadline, timeout):
+        """Pop an idle connection or reserve a slot for a new one (lock held)."""
+        while True:
+            if self.closed:
+                raise RuntimeError("Connection pool is closed")
+            self._evict_idle()
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+                self._in_use.add(conn)
+                return conn, returned_at
+            if self._size < self.maxconn:
+                self._size += 1
+                return None, None
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"No free connection within {timeout}s (maxconn={self.maxconn})")
+            self._cond.wait(remaining)
+
+    def _release_slot(self, conn=None):
+        with self._cond:
+            if conn is not None:
+                self._in_use.discard(conn)
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self, timeout=None):
+        """Check out a healthy connection, opening a new one if the pool has room."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                conn, returned_at = self._reserve(deadline, timeout)
+            # Network work (connect / health check) happens outside the lock
+            if conn is None:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._cond:
+                    self._in_use.add(conn)
+                return conn
+            stale = time.monotonic() - returned_at > self.check_after
+            if not conn.closed and (not stale or self._is_healthy(conn)):
+                return conn
+            conn.close()
+            self._release_slot(conn)
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if not close and not self.closed and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Error:
+                close = True
+        with self._cond:
+            self._in_use.discard(conn)
+            if close or self.closed or conn.closed:
+                conn.close()
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._evict_idle()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for the duration of a `with` block."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Close idle connections now; in-use ones are closed when returned."""
+        with self._cond:
+            self.closed = True
+            for conn, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
+
+
+def get_pool(minconn=1, maxconn=10, idle_timeout=300.0, lazy=False):
+    """Return the process-wide pool for the `.env` database, creating it on first use."""
+    settings = load_settings()
+    key = (os.getpid(),) + tuple(sorted(settings.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = ConnectionPool(settings, minconn=minconn, maxconn=maxconn,
+                                  idle_timeout=idle_timeout, lazy=lazy)
+            _pools[key] = pool
+        elif maxconn > pool.maxconn:
+            # Later callers may need a larger pool than the first one asked for
+            pool.maxconn = maxconn
+        return pool
+
+
+def close_pools():
+    """Close every pool opened by this process."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
+
+class F1DatabaseConnector:
+    def __init__(self, pooled=False, quiet=False, lazy=False, minconn=1, maxconn=10,
+                 idle_timeout=300.0):
+        """Load DB settings from `.env`.
+
+        `pooled` borrows the connection from the process-wide pool instead of
+        opening a dedicated one, `quiet` skips the version/database banner
+        queries, and `lazy` defers connecting until `connection` is first used.
+        """
+        settings = load_settings()
+        self.host = settings['host']
+        self.database = settings['database']
+        self.user = settings['user']
+        self.password = settings['password']
+        self.port = settings['port']
+        self.pooled = pooled
+        self.quiet = quiet
+        self.lazy = lazy
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_timeout = idle_timeout
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None and self.lazy:
+            self._open()
+        return self._connection
+
+    @connection.setter
+    def connection(self, value):
+        self._connection = value
+
+    @property
+    def pool(self):
+        """Shared pool for the configured database (created on first access)."""
+        return get_pool(minconn=self.minconn, maxconn=self.maxconn,
+                        idle_timeout=self.idle_timeout, lazy=self.lazy)
+
+    def settings(self):
+        return {
+            'host': self.host,
+            'database': self.database,
+            'user': self.user,
+            'password': self.password,
+            'port': self.port,
+        }
+
+    def _open(self):
+        if self.pooled:
+            self._connection = self.pool.getconn()
+        else:
+            self._connection = psycopg2.connect(**self.settings())
+
     def connect(self):
         """Connect to PostgreSQL."""
         try:
-            self.connection = psycopg2.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                port=self.port
-            )
-            
-            if self.connection:
-                cursor = self.connection.cursor()
+            if self.lazy:
+                if not self.quiet:
+                    print("PostgreSQL connection deferred until first use")
+                return True
+
+            self._open()
+
+            if self._connection and not self.quiet:
+                cursor = self._connection.cursor()
                 cursor.execute("SELECT version();")
                 db_version = cursor.fetchone()
                 print("Successfully connected to PostgreSQL")
                 print(f"Database version: {db_version[0]}")
-                
+
                 cursor.execute("SELECT current_database();")
                 database_name = cursor.fetchone()
                 print(f"Connected to database: {database_name[0]}")
                 cursor.close()
                 return True
-                
-        except Error as e:
+            return self._connection is not None
+
+        except (Error, TimeoutError) as e:
             print(f"Error while connecting to PostgreSQL: {e}")
             return False
-    
+
     def disconnect(self):
-        """Close connection."""
-        if self.connection:
-            self.connection.close()
-            print("PostgreSQL connection closed")
+        """Close connection (or hand it back to the pool)."""
+        if self._connection:
+            if self.pooled:
+                self.pool.putconn(self._connection)
+            else:
+                self._connection.close()
+            self._connection = None
+            if not self.quiet:
+                print("PostgreSQL connection closed")
+
+    def __enter__(self):
+        if not self.connect():
+            raise RuntimeError("Failed to connect to PostgreSQL. Please check your .env settings.")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.disconnect()
+        return False
 
 def main():
     """Quick connection test."""
@@ -69,5 +313,5 @@ if __name__ == "__main__":
         print(f"Missing required package: {e}")
         print("Install with: pip install -r requirements.txt")
         exit(1)
-    
-    main()
\ No newline at end of file
+
+    main()
@@ -1,38 +1,182 @@
+import csv
+import io
+import re
+import time
 import pandas as pd
+from psycopg2 import sql
 from connection import F1DatabaseConnector
+import columnar_export
 import os
-from sqlalchemy import create_engine, text
 
-def load_csv_to_db(csv_filepath, table_name):
-    connector = F1DatabaseConnector()
+SAMPLE_ROWS = 10000
+COPY_CHUNK_BYTES = 1024 * 1024
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$")
+INTEGER_RE = re.compile(r"^[-+]?\d+$")
+FLOAT_RE = re.compile(r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$|^[-+]?(inf|infinity|nan)$", re.IGNORECASE)
+BOOLEAN_RE = re.compile(r"^(true|false)$", re.IGNORECASE)
+
+
+def infer_column_types(csv_filepath, sample_rows=SAMPLE_ROWS, null_marker=""):
+    """Guess a PostgreSQL type per column from the first `sample_rows` rows.
+
+    Types are decided from the raw strings, exactly as COPY will see them:
+    "25.0" is not an integer, and with a `\\N` null marker an empty field is
+    an empty string (so the column stays TEXT) rather than a NULL.
+    """
+    sample = pd.read_csv(csv_filepath, nrows=sample_rows, dtype=str, keep_default_na=False)
+    types = {}
+    for col in sample.columns:
+        text = sample[col][sample[col] != null_marker]
+        if not len(text):
+            pg_type = "TEXT"
+        elif text.str.fullmatch(BOOLEAN_RE).all():
+            pg_type = "BOOLEAN"
+        elif text.str.fullmatch(INTEGER_RE).all():
+            pg_type = "BIGINT"
+        elif text.str.fullmatch(FLOAT_RE).all():
+            pg_type = "DOUBLE PRECISION"
+        elif text.str.fullmatch(DATE_RE).all():
+            pg_type = "DATE"
+        elif text.str.fullmatch(TIMESTAMP_RE).all():
+            pg_type = "TIMESTAMP"
+        else:
+            pg_type = "TEXT"
+        types[col.lower()] = pg_type  # PostgreSQL prefers lowercase column names
+    return types
+
+
+def detect_null_marker(csv_filepath, sample_rows=SAMPLE_ROWS):
+    """Kaggle F1 exports write NULL as `\\N`; everything else uses empty fields."""
+    with open(csv_filepath, newline="", encoding="utf-8") as fh:
+        reader = csv.reader(fh)
+        next(reader, None)
+        for n, row in enumerate(reader):
+            if "\\N" in row:
+                return "\\N"
+            if n >= sample_rows:
+                break
+    return ""
+
+
+def _swap_in(cur, staging, table_name):
+    """Replace `table_name` with the loaded staging table (same transaction)."""
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table_name)))
+    cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+        sql.Identifier(staging), sql.Identifier(table_name)))
+    cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table_name)))
+
+
+def _report(rows, path, table_name, elapsed, detail=""):
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Successfully loaded {rows} rows from {path} into table {table_name} "
+          f"in {elapsed:.2f}s ({rate:,.0f} rows/s{detail}).")
+
+
+def load_csv_to_db(csv_filepath, table_name, chunk_bytes=COPY_CHUNK_BYTES, sample_rows=SAMPLE_ROWS):
+    """Bulk-load a CSV with COPY into a staging table, then swap it in atomically.
+
+    The file is streamed to the server in `chunk_bytes` blocks, so memory use
+    does not grow with the file size. Column types are inferred from the first
+    `sample_rows` rows; if a later row does not fit, COPY fails and the existing
+    table is left untouched.
+    """
+    connector = F1DatabaseConnector(quiet=True)
     if not connector.connect():
         print("Failed to connect to database.")
         return
 
+    conn = connector.connection
+    staging = f"{table_name}__staging"
     try:
-        df = pd.read_csv(csv_filepath)
-        df.columns = [c.lower() for c in df.columns] # PostgreSQL prefers lowercase column names
+        null_marker = detect_null_marker(csv_filepath, sample_rows)
+        types = infer_column_types(csv_filepath, sample_rows, null_marker)
+        columns = sql.SQL(", ").join(
+            sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(pg_type))
+            for name, pg_type in types.items()
+        )
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(staging)))
+            cur.execute(sql.SQL("CREATE TABLE {} ({})").format(sql.Identifier(staging), columns))
+            # FORCE_NULL: a quoted "" (or "\N") in a typed column is NULL, not a parse error
+            typed = [sql.Identifier(name) for name, pg_type in types.items() if pg_type != "TEXT"]
+            options = sql.SQL(", FORCE_NULL ({})").format(sql.SQL(", ").join(typed)) if typed else sql.SQL("")
+            copy_stmt = sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv, NULL {}{})").format(
+                sql.Identifier(staging), sql.Literal(null_marker), options)
+            with open(csv_filepath, "r", newline="", encoding="utf-8") as fh:
+                fh.readline()  # header already used for the column list
+                cur.copy_expert(copy_stmt.as_string(conn), fh, size=chunk_bytes)
+            rows = cur.rowcount
+            _swap_in(cur, staging, table_name)
+        conn.commit()
+        _report(rows, csv_filepath, table_name, time.perf_counter() - start)
+        return rows
 
-        # Ensure 'date' column is in correct format if it exists
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
+    except Exception as e:
+        conn.rollback()
+        print(f"Error loading CSV to database: {e}")
+    finally:
+        connector.disconnect()
+
+def load_columnar_to_db(path, table_name):
+    """Fast path for `main.py --format parquet/feather` exports.
 
-        # Create table and insert data
-        engine = create_engine(f"postgresql+psycopg2://{connector.user}:{connector.password}@{connector.host}:{connector.port}/{connector.database}")
+    Column types come from the file's Arrow schema, so nothing is inferred, and
+    each record batch is sent with its own COPY. Same staging/swap as the CSV path.
 
-        # Drop table if it exists (for easy re-runs)
-        with engine.connect() as conn:
-            conn.execute(text(f"DROP TABLE IF EXISTS {table_name};"))
-            conn.commit()
+    Batches are rendered to CSV by Arrow's C++ writer rather than encoded for
+    COPY (FORMAT binary), which would need a per-type encoder in Python for
+    PostgreSQL's binary wire format. The time spent rendering is reported
+    separately so the cost of that round trip stays visible.
+    """
+    connector = F1DatabaseConnector(quiet=True)
+    if not connector.connect():
+        print("Failed to connect to database.")
+        return
 
-        df.to_sql(table_name, engine, if_exists='replace', index=False)
-        print(f"Successfully loaded {len(df)} rows from {csv_filepath} into table {table_name}.")
+    conn = connector.connection
+    staging = f"{table_name}__staging"
+    try:
+        schema, batches = columnar_export.open_batches(path)
+        columns = sql.SQL(", ").join(
+            sql.SQL("{} {}").format(sql.Identifier(field.name.lower()),
+                                    sql.SQL(columnar_export.pg_type(field.type)))
+            for field in schema
+        )
+        start = time.perf_counter()
+        rows = 0
+        render_seconds = 0.0
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(staging)))
+            cur.execute(sql.SQL("CREATE TABLE {} ({})").format(sql.Identifier(staging), columns))
+            copy_stmt = sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv)").format(
+                sql.Identifier(staging)).as_string(conn)
+            for batch in batches:
+                render_start = time.perf_counter()
+                data = columnar_export.batch_to_csv(batch)
+                render_seconds += time.perf_counter() - render_start
+                cur.copy_expert(copy_stmt, io.BytesIO(data))
+                rows += batch.num_rows
+            _swap_in(cur, staging, table_name)
+        conn.commit()
+        _report(rows, path, table_name, time.perf_counter() - start,
+                detail=f", {render_seconds:.2f}s rendering CSV for COPY")
+        return rows
 
     except Exception as e:
-        print(f"Error loading CSV to database: {e}")
+        conn.rollback()
+        print(f"Error loading {path} to database: {e}")
     finally:
         connector.disconnect()
 
+
+def load_file_to_db(path, table_name):
+    """Pick the loader by file extension (.parquet/.arrow/.feather, else CSV)."""
+    if path.endswith((".parquet", ".arrow", ".feather")):
+        return load_columnar_to_db(path, table_name)
+    return load_csv_to_db(path, table_name)
+
 if __name__ == "__main__":
     csv_file = os.path.join(os.path.dirname(__file__), "exports", "results_growth.csv")
     db_table_name = "results_growth_csv" # This will be the new table name in your DB
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
-"""Run queries in `queries.sql` and export results to CSV in `outputs/`."""
+"""Run queries in `queries.sql` and export results to CSV (or Parquet/Feather) in `outputs/`."""
 
-from connection import F1DatabaseConnector
+from connection import F1DatabaseConnector, ConnectionPool, close_pools
+import aggregates
+from query_cache import QueryCache
+from columnar_export import FORMAT_EXTENSIONS, write_columnar
+from run_profile import RunProfiler
+import argparse
 import os
 import csv
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
 
 QUERIES_FILE = os.path.join(os.path.dirname(__file__), "queries.sql")
 OUTPUTS_DIR = os.path.join(os.path.dirname(__file__), "outputs")
+RUN_LOG = os.path.join(OUTPUTS_DIR, "run_log.jsonl")
 
 
 def load_queries(path: str) -> List[str]:
@@ -33,40 +41,246 @@ def load_queries(path: str) -> List[str]:
         stmts.append(tail)
     return [s.strip().rstrip(";") + ";" for s in stmts if s and s.strip() != ";"]
 
-def run_and_export(connector: F1DatabaseConnector, statements: List[str]):
+
+EXPORT_MODES = ("cursor", "stream", "copy")
+STREAM_ITERSIZE = 5000
+
+
+def is_query(sql: str) -> bool:
+    """True for statements that return rows and can be wrapped in DECLARE/COPY."""
+    head = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ""
+    return head in ("select", "with", "values", "table")
+
+
+def write_csv(cur, out: str, batch_size: int = 1000) -> int:
+    """Write the pending result set of `cur` to `out`; return the row count."""
+    # Named cursors only fill `description` after the first fetch
+    batch = cur.fetchmany(batch_size)
+    cols = [d[0] for d in cur.description]
+    rows = 0
+    with open(out, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh)
+        w.writerow(cols)
+        while batch:
+            w.writerows(batch)
+            rows += len(batch)
+            batch = cur.fetchmany(batch_size)
+    return rows
+
+
+def copy_csv(cur, sql: str, out: str) -> int:
+    """Let the server render the CSV with COPY and stream it straight to `out`.
+
+    Values are formatted by PostgreSQL (e.g. booleans as `t`/`f`), which can
+    differ slightly from `csv.writer` output.
+    """
+    query = sql.strip().rstrip(";")
+    with open(out, "wb") as fh:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", fh)
+    return cur.rowcount
+
+
+def output_path(i: int, fmt: str = "csv") -> str:
+    return os.path.join(OUTPUTS_DIR, f"q{i}.{FORMAT_EXTENSIONS[fmt]}")
+
+
+def export_statement(conn, i: int, sql: str, mode: str = "cursor", fmt: str = "csv") -> dict:
+    """Execute statement `i` on `conn` and export any result set to `q{i}.<ext>`.
+
+    `cursor` fetches through a client-side cursor, `stream` uses a named
+    server-side cursor so only `STREAM_ITERSIZE` rows are held in memory, and
+    `copy` pipes `COPY (query) TO STDOUT` into the file. Statements that do not
+    return rows always run on a plain cursor. Parquet/Feather output is always
+    streamed, since COPY cannot produce it.
+    """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"Unknown export mode {mode!r}; expected one of {EXPORT_MODES}")
+    out = output_path(i, fmt)
+    if fmt != "csv":
+        if is_query(sql):
+            with conn.cursor(name=f"export_q{i}") as cur:
+                cur.itersize = STREAM_ITERSIZE
+                cur.execute(sql)
+                return {"rows": write_columnar(cur, out, fmt), "output": out}
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            if cur.description:
+                return {"rows": write_columnar(cur, out, fmt), "output": out}
+            return {"rows": cur.rowcount, "output": None}
+    if mode != "cursor" and is_query(sql):
+        if mode == "copy":
+            with conn.cursor() as cur:
+                return {"rows": copy_csv(cur, sql, out), "output": out}
+        with conn.cursor(name=f"export_q{i}") as cur:
+            cur.itersize = STREAM_ITERSIZE
+            cur.execute(sql)
+            return {"rows": write_csv(cur, out, STREAM_ITERSIZE), "output": out}
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        if cur.description:
+            return {"rows": write_csv(cur, out), "output": out}
+        return {"rows": cur.rowcount, "output": None}
+
+
+def export_cached(conn, i: int, sql: str, mode: str = "cursor",
+                  cache: Optional[QueryCache] = None, fmt: str = "csv") -> dict:
+    """`export_statement`, but reuse the cached output while its tables are unchanged."""
+    key = cache.key(sql, f"{mode}:{fmt}") if cache else None
+    if key is None:
+        return dict(export_statement(conn, i, sql, mode, fmt), cached=False)
+    out = output_path(i, fmt)
+    # Read the watermarks first so writes racing with the export invalidate it
+    marks = cache.watermarks(conn, sql)
+    entry = cache.restore(key, marks, out)
+    if entry:
+        return {"rows": entry["rows"], "output": out, "cached": True}
+    res = export_statement(conn, i, sql, mode, fmt)
+    if res["output"]:
+        cache.store(key, marks, res["output"], res["rows"])
+    return dict(res, cached=False)
+
+
+def run_and_export(connector: F1DatabaseConnector, statements: List[str], mode: str = "cursor",
+                   cache: Optional[QueryCache] = None, fmt: str = "csv",
+                   profiler: Optional[RunProfiler] = None):
     if not connector.connection:
         raise RuntimeError("Database connection is not established.")
     os.makedirs(OUTPUTS_DIR, exist_ok=True)
-    cur = connector.connection.cursor()
     for i, sql in enumerate(statements, start=1):
+        snapshot = profiler.begin(connector.connection, sql) if profiler else None
+        start = time.perf_counter()
         try:
-            cur.execute(sql)
-            if cur.description:
-                cols = [d[0] for d in cur.description]
-                out = os.path.join(OUTPUTS_DIR, f"q{i}.csv")
-                with open(out, "w", newline="", encoding="utf-8") as fh:
-                    w = csv.writer(fh)
-                    w.writerow(cols)
-                    while True:
-                        batch = cur.fetchmany(1000)
-                        if not batch:
-                            break
-                        w.writerows(batch)
-                print(f"Saved: {out}")
+            res = export_cached(connector.connection, i, sql, mode, cache, fmt)
+            if res["cached"]:
+                print(f"Unchanged: {res['output']} (cached)")
+            elif res["output"]:
+                print(f"Saved: {res['output']}")
             else:
-                print(f"Query {i} affected rows: {cur.rowcount}")
+                print(f"Query {i} affected rows: {res['rows']}")
         except Exception as e:
+            res = {"error": str(e).strip()}
             print(f"Query {i} failed: {e}")
             try:
                 connector.connection.rollback()
             except Exception:
                 pass
-    cur.close()
+        if profiler:
+            profiler.record(connector.connection, i, sql, res, time.perf_counter() - start, snapshot)
+
+
+def _run_pooled(pool: ConnectionPool, i: int, sql: str, timeout: Optional[float],
+                mode: str = "cursor", cache: Optional[QueryCache] = None, fmt: str = "csv",
+                profiler: Optional[RunProfiler] = None) -> dict:
+    """Run statement `i` on a pooled connection and export it as soon as it finishes."""
+    conn = pool.getconn()
+    snapshot = None
+    start = time.perf_counter()
+    result = {"query": i, "ok": False, "rows": 0, "seconds": 0.0, "output": None, "error": None,
+              "cached": False}
+    try:
+        # SET LOCAL keeps the timeout scoped to this transaction only
+        if timeout:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+        if profiler:
+            snapshot = profiler.begin(conn, sql)
+            start = time.perf_counter()
+        result.update(export_cached(conn, i, sql, mode, cache, fmt))
+        conn.commit()
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e).strip()
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+    result["seconds"] = time.perf_counter() - start
+    try:
+        if profiler:
+            profiler.record(conn, i, sql, result, result["seconds"], snapshot)
+    finally:
+        pool.putconn(conn)
+    return result
+
+
+def run_parallel(connector: F1DatabaseConnector, statements: List[str],
+                 pool_size: int = 4, timeout: Optional[float] = None,
+                 mode: str = "cursor", cache: Optional[QueryCache] = None,
+                 fmt: str = "csv", profiler: Optional[RunProfiler] = None) -> List[dict]:
+    """Run statements concurrently over a bounded pool of connections.
+
+    Each `q{i}.csv` is written by the worker that ran the query, so fast queries
+    are not held back by slow ones. Returns per-query results ordered by index.
+    """
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)
+    pool_size = max(1, min(pool_size, len(statements)))
+    pool = connector.pool
+    # The shared pool may already be larger; the executor bounds concurrency
+    pool.maxconn = max(pool.maxconn, pool_size)
+    results: List[dict] = []
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        futures = [executor.submit(_run_pooled, pool, i, sql, timeout, mode, cache, fmt, profiler)
+                   for i, sql in enumerate(statements, start=1)]
+        for fut in as_completed(futures):
+            res = fut.result()
+            results.append(res)
+            if not res["ok"]:
+                print(f"Query {res['query']} failed after {res['seconds']:.2f}s: {res['error']}")
+            elif res["cached"]:
+                print(f"Unchanged: {res['output']} (cached, {res['seconds']:.2f}s)")
+            elif res["output"]:
+                print(f"Saved: {res['output']} ({res['rows']} rows, {res['seconds']:.2f}s)")
+            else:
+                print(f"Query {res['query']} affected rows: {res['rows']} ({res['seconds']:.2f}s)")
+    wall = time.perf_counter() - wall_start
+
+    results.sort(key=lambda r: r["query"])
+    serial = sum(r["seconds"] for r in results)
+    print(f"\n{'Query':<8}{'Status':<8}{'Rows':>10}{'Seconds':>10}")
+    for r in results:
+        print(f"q{r['query']:<7}{'ok' if r['ok'] else 'FAILED':<8}{r['rows']:>10}{r['seconds']:>10.2f}")
+    speedup = serial / wall if wall > 0 else 0.0
+    print(f"Total: {wall:.2f}s wall vs {serial:.2f}s summed query time "
+          f"(speedup x{speedup:.2f}, pool size {pool_size})")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run queries.sql and export each result to outputs/q{i}.csv")
+    parser.add_argument("--parallel", action="store_true",
+                        help="run statements concurrently over a connection pool")
+    parser.add_argument("--pool-size", type=int, default=4,
+                        help="maximum number of pooled connections in parallel mode (default: 4)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="per-query timeout in seconds in parallel mode")
+    parser.add_argument("--export-mode", choices=EXPORT_MODES, default="cursor",
+                        help="cursor: client-side fetch (default); stream: server-side cursor "
+                             "with bounded memory; copy: COPY ... TO STDOUT straight to file")
+    parser.add_argument("--format", choices=sorted(FORMAT_EXTENSIONS), default="csv",
+                        help="output format: csv (default), parquet, or feather (Arrow IPC); "
+                             "columnar formats keep column types and are compressed")
+    parser.add_argument("--aggregates", action="store_true",
+                        help="refresh the incremental summary tables and serve Q1/Q5/Q6/Q9 from them")
+    parser.add_argument("--force", action="store_true",
+                        help="re-run every statement even if its cached output is still valid")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="neither read nor update the result cache in outputs/.cache")
+    parser.add_argument("--profile", action="store_true",
+                        help="log per-statement timing, rows and bytes to a JSONL run log and print a summary")
+    parser.add_argument("--explain-over", type=float, default=None, metavar="SECONDS",
+                        help="with --profile, re-run statements slower than this under "
+                             "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and log the plan")
+    parser.add_argument("--run-log", default=RUN_LOG, help=f"JSONL run log path (default: {RUN_LOG})")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
     print("Running queries and exporting CSVs...")
-    connector = F1DatabaseConnector()
+    # In parallel mode every worker borrows from the shared pool, so the
+    # connector itself never needs a connection of its own
+    connector = F1DatabaseConnector(pooled=True, lazy=args.parallel, maxconn=args.pool_size)
     if not connector.connect():
         print("Failed to connect. Please check your .env settings.")
         return
@@ -75,9 +289,38 @@ def main():
         if not queries:
             print(f"No queries loaded from {QUERIES_FILE}. Ensure the file exists and contains SQL statements.")
             return
-        run_and_export(connector, queries)
+        cache = None if args.no_cache else QueryCache(OUTPUTS_DIR, force=args.force)
+        profiler = None
+        if args.profile or args.explain_over is not None:
+            profiler = RunProfiler(args.run_log, explain_over=args.explain_over,
+                                   mode=args.export_mode, fmt=args.format,
+                                   statement_timeout=args.timeout if args.parallel else None)
+        if args.aggregates:
+            with connector.pool.connection() as conn:
+                applied = aggregates.refresh_aggregates(conn)
+            changed = ", ".join(f"{src} {rows}" for src, rows in applied.items())
+            print(f"Summary tables refreshed (changed rows applied: {changed})")
+            if cache and any(applied.values()):
+                # Our own writes may not be visible in pg_stat counters yet
+                cache.invalidate_tables(aggregates.SUMMARY_TABLES)
+            queries = aggregates.substitute_queries(queries)
+        try:
+            if args.parallel:
+                run_parallel(connector, queries, pool_size=args.pool_size, timeout=args.timeout,
+                             mode=args.export_mode, cache=cache, fmt=args.format, profiler=profiler)
+            else:
+                run_and_export(connector, queries, mode=args.export_mode, cache=cache, fmt=args.format,
+                               profiler=profiler)
+        finally:
+            if profiler:
+                profiler.save()
+                profiler.print_summary()
+            if cache:
+                cache.save()
+                print(f"Result cache: {cache.hits} hit(s), {cache.misses} miss(es)")
     finally:
         connector.disconnect()
+        close_pools()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""On-disk result cache for `main.py` exports.
+
+A cached export is reused when the statement text (plus export mode) is
+unchanged and none of the tables it reads have changed since it was written.
+Table changes are detected from `pg_stat_user_tables` insert/update/delete
+counters, which PostgreSQL maintains for free. Counters are flushed
+shortly after a transaction ends, so a write committed a few seconds before
+the check may only be seen on the next run; use `--force` when that matters.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+CACHE_DIR_NAME = ".cache"
+MANIFEST_NAME = "manifest.json"
+MAX_ENTRIES = 200
+MAX_BYTES = 512 * 1024 * 1024
+
+TABLE_RE = re.compile(r"\b(?:from|join)\s+([a-z_][a-z0-9_]*(?:\.[a-z_][a-z0-9_]*)?)", re.IGNORECASE)
+# Results of these change without any table write, so they are never cached
+VOLATILE_RE = re.compile(r"\b(random|now|clock_timestamp|current_time|current_timestamp|localtime|localtimestamp)\b",
+                         re.IGNORECASE)
+CURRENT_DATE_RE = re.compile(r"\bcurrent_date\b", re.IGNORECASE)
+# Function calls whose arguments use FROM as a keyword, e.g. EXTRACT(YEAR FROM ...)
+FROM_ARGUMENT_RE = re.compile(r"\b(?:extract|substring|trim|overlay|position)\s*\([^()]*\)", re.IGNORECASE)
+
+
+def referenced_tables(sql):
+    """Best-effort list of tables a statement reads (FROM/JOIN targets)."""
+    sql = FROM_ARGUMENT_RE.sub("()", sql)
+    names = {m.group(1).lower().split(".")[-1] for m in TABLE_RE.finditer(sql)}
+    return sorted(names)
+
+
+class QueryCache:
+    """Fingerprint -> cached output file, with LRU eviction by entry count and size."""
+
+    def __init__(self, outputs_dir, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, force=False):
+        """`force` skips every lookup but still stores fresh results."""
+        self.force = force
+        self.dir = os.path.join(outputs_dir, CACHE_DIR_NAME)
+        self.manifest_path = os.path.join(self.dir, MANIFEST_NAME)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as fh:
+                self.entries = json.load(fh)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def key(self, sql, mode):
+        """Fingerprint for a statement, or None when its result is not cacheable."""
+        if VOLATILE_RE.search(sql):
+            return None
+        normalized = " ".join(sql.split()).lower()
+        parts = [normalized, mode]
+        if CURRENT_DATE_RE.search(sql):
+            parts.append(datetime.date.today().isoformat())
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def watermarks(conn, sql):
+        """Per-table change counters for the tables `sql` reads.
+
+        Names are resolved against pg_class, so CTE names and set-returning
+        functions that the regex picks up are ignored. Relations without
+        counters (views) are marked None so the statement is never cached.
+        """
+        tables = referenced_tables(sql)
+        if not tables:
+            return {}
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname, s.n_tup_ins, s.n_tup_upd, s.n_tup_del, s.n_live_tup
+                FROM pg_class c
+                LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+                WHERE c.relname = ANY(%s)
+                  AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+                  AND pg_table_is_visible(c.oid)
+            """, (tables,))
+            return {row[0]: None if row[1] is None else list(row[1:]) for row in cur.fetchall()}
+
+    def restore(self, key, marks, out):
+        """Make `out` hold the cached result if still valid; return the entry or None."""
+        with self._lock:
+            entry = self.entries.get(key)
+            valid = (
+                not self.force
+                and entry is not None
+                and None not in marks.values()
+                and entry["watermarks"] == marks
+                and os.path.exists(os.path.join(self.dir, entry["file"]))
+            )
+            if not valid:
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self.hits += 1
+        cached = os.path.join(self.dir, entry["file"])
+        try:
+            st = os.stat(out)
+            current = st.st_size == entry["bytes"] and st.st_mtime == entry.get("output_mtime")
+        except OSError:
+            current = False
+        if not current:
+            shutil.copyfile(cached, out)
+            with self._lock:
+                entry["output_mtime"] = os.stat(out).st_mtime
+        return entry
+
+    def store(self, key, marks, out, rows):
+        """Remember `out` as the result for `key` at the given watermarks."""
+        if None in marks.values():
+            return
+        name = key + os.path.splitext(out)[1]
+        shutil.copyfile(out, os.path.join(self.dir, name))
+        with self._lock:
+            self.entries[key] = {
+                "file": name,
+                "watermarks": marks,
+                "rows": rows,
+                "bytes": os.path.getsize(out),
+                "output_mtime": os.stat(out).st_mtime,
+                "last_used": time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until both limits hold (lock held)."""
+        by_age = sorted(self.entries.items(), key=lambda kv: kv[1]["last_used"])
+        total = sum(e["bytes"] for e in self.entries.values())
+        while by_age and (len(self.entries) > self.max_entries or total > self.max_bytes):
+            key, entry = by_age.pop(0)
+            del self.entries[key]
+            total -= entry["bytes"]
+            try:
+                os.remove(os.path.join(self.dir, entry["file"]))
+            except OSError:
+                pass
+
+    def invalidate_tables(self, tables):
+        """Drop entries that read any of `tables` (for writes made by this run)."""
+        tables = set(tables)
+        with self._lock:
+            for key in [k for k, e in self.entries.items() if tables & set(e["watermarks"])]:
+                entry = self.entries.pop(key)
+                try:
+                    os.remove(os.path.join(self.dir, entry["file"]))
+                except OSError:
+                    pass
+
+    def save(self):
+        with self._lock:
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(self.entries, fh, indent=1)
+            os.replace(tmp, self.manifest_path)
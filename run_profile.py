@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Per-statement instrumentation for `main.py` runs.
+
+Every statement gets a JSONL record (wall time, rows, bytes written, status).
+When the `pg_stat_statements` extension is installed, `server_ms` is the
+statement's execution time on the server, taken as the delta of its entry's
+`total_exec_time` around the run (the entry is found through the query id
+from `EXPLAIN VERBOSE`, which only plans). For the `stream` and `copy` export
+modes the query runs nested inside DECLARE/COPY, so that needs
+`pg_stat_statements.track = all`.
+
+Statements slower than `explain_over` seconds are re-run under
+`EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`, which adds the planning time,
+buffer counts and the full plan (and `server_ms` when the extension is not
+available). That re-executes the query, so the threshold keeps the extra cost
+to the statements worth looking at; `explain_over=0` explains everything.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+
+def _buffers(plan):
+    """Shared buffer hits/reads for the whole plan (root node totals)."""
+    return plan.get("Shared Hit Blocks"), plan.get("Shared Read Blocks")
+
+
+def _decode(explain):
+    # psycopg2 decodes the json column; older servers may return text
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+    return explain[0]
+
+
+class RunProfiler:
+    def __init__(self, log_path, explain_over=None, mode="cursor", fmt="csv", statement_timeout=None):
+        """`statement_timeout` (seconds) also bounds the EXPLAIN ANALYZE re-runs."""
+        self.log_path = log_path
+        self.explain_over = explain_over
+        self.mode = mode
+        self.fmt = fmt
+        self.statement_timeout = statement_timeout
+        self.run_id = datetime.datetime.now().isoformat(timespec="seconds")
+        self.records = []
+        self._lock = threading.Lock()
+        self._pgss = None  # pg_stat_statements usable; None until first checked
+
+    def _in_savepoint(self, conn, fn):
+        """Run `fn(cur)` without disturbing the caller's transaction; None on error."""
+        with conn.cursor() as cur:
+            cur.execute("SAVEPOINT run_profile")
+            try:
+                value = fn(cur)
+            except Exception:
+                cur.execute("ROLLBACK TO SAVEPOINT run_profile")
+                value = None
+            cur.execute("RELEASE SAVEPOINT run_profile")
+        return value
+
+    def _exec_totals(self, conn, query_id):
+        """(total_exec_time ms, calls) of `query_id` in pg_stat_statements, or None."""
+        def totals(cur):
+            cur.execute("""
+                SELECT COALESCE(SUM(total_exec_time), 0), COALESCE(SUM(calls), 0)
+                FROM pg_stat_statements
+                WHERE queryid = %s AND dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+            """, (query_id,))
+            return cur.fetchone()
+        return self._in_savepoint(conn, totals)
+
+    def begin(self, conn, sql):
+        """Snapshot taken just before `sql` runs; pass it to `record`. None without pg_stat_statements."""
+        if self._pgss is False:
+            return None
+        if self._pgss is None:
+            def installed(cur):
+                cur.execute("SELECT to_regclass('pg_stat_statements') IS NOT NULL")
+                return cur.fetchone()[0]
+            self._pgss = bool(self._in_savepoint(conn, installed))
+            if not self._pgss:
+                return None
+
+        def query_id(cur):
+            cur.execute(f"EXPLAIN (VERBOSE, FORMAT JSON) {sql.strip().rstrip(';')}")
+            return _decode(cur.fetchone()[0]).get("Query Identifier")
+        qid = self._in_savepoint(conn, query_id)
+        if not qid:
+            return None
+        before = self._exec_totals(conn, qid)
+        if before is None:
+            self._pgss = False  # e.g. no permission, or a server older than PG 13
+            return None
+        return {"query_id": qid, "before": before}
+
+    def _server_ms(self, conn, snapshot):
+        after = self._exec_totals(conn, snapshot["query_id"])
+        if after is None or after[1] <= snapshot["before"][1]:
+            return None
+        return round(float(after[0] - snapshot["before"][0]), 3)
+
+    def _explain(self, conn, sql):
+        with conn.cursor() as cur:
+            # Runs in its own transaction, so the caller's SET LOCAL is gone
+            if self.statement_timeout:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout * 1000),))
+            cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql.strip().rstrip(';')}")
+            explain = cur.fetchone()[0]
+        conn.rollback()
+        return _decode(explain)
+
+    def record(self, conn, i, sql, result, seconds, snapshot=None):
+        """Log one statement; `result` is the dict returned by `export_cached`, `snapshot` from `begin`."""
+        output = result.get("output")
+        rec = {
+            "run_id": self.run_id,
+            "query": i,
+            "sql_sha1": hashlib.sha1(" ".join(sql.split()).encode("utf-8")).hexdigest()[:12],
+            "mode": self.mode,
+            "format": self.fmt,
+            "ok": result.get("error") is None,
+            "cached": result.get("cached", False),
+            "rows": result.get("rows"),
+            "bytes": os.path.getsize(output) if output and os.path.exists(output) else None,
+            "wall_seconds": round(seconds, 4),
+            "planning_ms": None,
+            "server_ms": None,
+            "shared_hit_blocks": None,
+            "shared_read_blocks": None,
+            "error": result.get("error"),
+            "sql": sql,
+        }
+        if snapshot and rec["ok"] and not rec["cached"]:
+            # Before any EXPLAIN ANALYZE, which would add to the same counters
+            rec["server_ms"] = self._server_ms(conn, snapshot)
+        slow = self.explain_over is not None and seconds >= self.explain_over
+        if rec["ok"] and not rec["cached"] and slow:
+            try:
+                explain = self._explain(conn, sql)
+                rec["planning_ms"] = explain.get("Planning Time")
+                if rec["server_ms"] is None:
+                    rec["server_ms"] = explain.get("Execution Time")
+                hit, read = _buffers(explain["Plan"])
+                rec["shared_hit_blocks"], rec["shared_read_blocks"] = hit, read
+                rec["plan"] = explain["Plan"]
+            except Exception as e:
+                conn.rollback()
+                rec["explain_error"] = str(e).strip()
+        with self._lock:
+            self.records.append(rec)
+        return rec
+
+    def save(self):
+        """Append this run's records to the JSONL log."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with self._lock, open(self.log_path, "a", encoding="utf-8") as fh:
+            for rec in sorted(self.records, key=lambda r: r["query"]):
+                fh.write(json.dumps(rec, default=str) + "\n")
+
+    def print_summary(self):
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+
+        print(f"\n{'Query':<7}{'Status':<8}{'Rows':>9}{'KB':>10}{'Wall s':>9}"
+              f"{'Server ms':>11}{'Buf hit':>9}{'Buf read':>10}")
+        for rec in sorted(self.records, key=lambda r: r["query"]):
+            status = "cached" if rec["cached"] else ("ok" if rec["ok"] else "FAILED")
+            kb = rec["bytes"] / 1024 if rec["bytes"] is not None else None
+            print(f"q{rec['query']:<6}{status:<8}{fmt(rec['rows'], 'd'):>9}{fmt(kb, '.1f'):>10}"
+                  f"{rec['wall_seconds']:>9.3f}{fmt(rec['server_ms'], '.1f'):>11}"
+                  f"{fmt(rec['shared_hit_blocks'], 'd'):>9}{fmt(rec['shared_read_blocks'], 'd'):>10}")
+        total = sum(r["wall_seconds"] for r in self.records)
+        print(f"Total statement time: {total:.2f}s; run log: {self.log_path} (run {self.run_id})")